@@ -60,6 +60,23 @@ DATABASES = {
     }
 }
 
+# Shared cache so version stamps are seen by every worker process
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -89,8 +106,72 @@ LOGOUT_REDIRECT_URL = '/'
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# CV text extraction
+CV_PDF_ENGINE = config('CV_PDF_ENGINE', default='auto')
+CV_PDF_MAX_PAGES = config('CV_PDF_MAX_PAGES', default=30, cast=int)
+CV_PDF_PARALLEL_MIN_PAGES = config('CV_PDF_PARALLEL_MIN_PAGES', default=8, cast=int)
+CV_PDF_WORKERS = config('CV_PDF_WORKERS', default=0, cast=int) or None
+
+# Extraction runs in sandboxed subprocesses with per-file limits
+CV_EXTRACTION_SANDBOX = config('CV_EXTRACTION_SANDBOX', default=True, cast=bool)
+CV_EXTRACTION_WORKERS = config('CV_EXTRACTION_WORKERS', default=2, cast=int)
+CV_EXTRACTION_TIMEOUT = config('CV_EXTRACTION_TIMEOUT', default=30, cast=int)
+CV_EXTRACTION_MAX_RSS_MB = config('CV_EXTRACTION_MAX_RSS_MB', default=512, cast=int)
+
 # Gemini AI Configuration
 GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
+# 'google' calls the API; 'fake' answers locally with deterministic replies, for load tests and offline runs
+GEMINI_BACKEND = config('GEMINI_BACKEND', default='google')
+# Overrides for the fake backend's latency, error rate and stream timing (see cv_optimizer.gemini_fake.FAKE_DEFAULTS)
+GEMINI_FAKE = {}
+# One structured call returns the analysis and optimized CV; False keeps the two-call path
+GEMINI_COMBINED_ANALYSIS = config('GEMINI_COMBINED_ANALYSIS', default=True, cast=bool)
+# Async views (for ASGI deployments) cap concurrent Gemini calls per process
+GEMINI_ASYNC_VIEWS = config('GEMINI_ASYNC_VIEWS', default=False, cast=bool)
+GEMINI_MAX_CONCURRENCY = config('GEMINI_MAX_CONCURRENCY', default=32, cast=int)
+# Deadline in seconds for each Gemini call, retries included
+GEMINI_TIMEOUT = config('GEMINI_TIMEOUT', default=60, cast=int)
+GEMINI_RETRIES = config('GEMINI_RETRIES', default=2, cast=int)
+# The breaker opens when this share of recent calls failed or took over GEMINI_BREAKER_SLOW_SECONDS;
+# while open, analyses come from the local keyword scorer, flagged as degraded
+GEMINI_BREAKER_ERROR_RATE = config('GEMINI_BREAKER_ERROR_RATE', default=0.5, cast=float)
+GEMINI_BREAKER_SLOW_SECONDS = config('GEMINI_BREAKER_SLOW_SECONDS', default=20, cast=float)
+GEMINI_BREAKER_OPEN_SECONDS = config('GEMINI_BREAKER_OPEN_SECONDS', default=30, cast=float)
+# CV sections are trimmed to this many (estimated) tokens in prompts
+GEMINI_SECTION_TOKEN_BUDGET = config('GEMINI_SECTION_TOKEN_BUDGET', default=800, cast=int)
+# Log the API's token count for each uncached sync prompt next to the local estimate (one extra request per call)
+GEMINI_COUNT_TOKENS = config('GEMINI_COUNT_TOKENS', default=False, cast=bool)
+# Identical Gemini calls in flight share one request: threads wait on it, and worker processes
+# take a lock file per prompt so the later one reads the cached reply instead of calling again
+GEMINI_COALESCE = config('GEMINI_COALESCE', default=True, cast=bool)
+GEMINI_LOCK_DIR = config('GEMINI_LOCK_DIR', default=str(BASE_DIR / 'cache' / 'locks'))
+
+# Gemini responses are cached in the database per model and prompt
+GEMINI_CACHE_ENABLED = config('GEMINI_CACHE_ENABLED', default=True, cast=bool)
+GEMINI_CACHE_MAX_ENTRIES = config('GEMINI_CACHE_MAX_ENTRIES', default=5000, cast=int)
+# Per-method TTL overrides in seconds, e.g. {'find_matching_jobs': 3600}
+GEMINI_CACHE_TTLS = {}
+
+# Stored application guides older than this many seconds are served once more while a background refresh runs
+APPLICATION_GUIDE_MAX_AGE = config('APPLICATION_GUIDE_MAX_AGE', default=3 * 24 * 3600, cast=int)
+# Least recently viewed guides beyond this many are deleted, as are guides unopened for 30 days
+APPLICATION_GUIDE_MAX_ENTRIES = config('APPLICATION_GUIDE_MAX_ENTRIES', default=5000, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'cv_optimizer': {
+            'handlers': ['console'],
+            'level': config('CV_OPTIMIZER_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -7,7 +7,7 @@ from accounts.models import CustomUser
 from cv_optimizer.models import CVUpload
 from job_scraper.models import JobListing
 from core.models import ContactMessage
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 
 @staff_member_required
 def admin_dashboard(request):
@@ -46,4 +46,20 @@ def admin_dashboard(request):
         'latest_messages': latest_messages,
     }
     
-    return render(request, 'admin/index.html', context)
\ No newline at end of file
+    return render(request, 'admin/index.html', context)
+
+@staff_member_required
+def metrics(request):
+    from cv_optimizer import metrics as cv_metrics
+    
+    # Merges the snapshots published by other processes, such as the analysis worker,
+    # with this one; other web processes only show up if they publish too
+    process = cv_metrics.process_name()
+    cv_metrics.record_process_gauges()
+    snapshots = cv_metrics.published_snapshots(exclude=process)
+    snapshots[process] = cv_metrics.snapshot()
+    
+    return HttpResponse(
+        cv_metrics.render_prometheus(cv_metrics.merge_snapshots(snapshots)),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
\ No newline at end of file
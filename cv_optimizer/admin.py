@@ -1,14 +1,54 @@
 from django.contrib import admin
-from .models import CVUpload, ATSKeyword, CVTemplate, CreatedCV
+from .models import CVUpload, ExtractedText, CVAnalysis, AnalysisJob, GeminiResponse, ApplicationGuide, ATSKeyword, CVTemplate, CreatedCV
 
 @admin.register(CVUpload)
 class CVUploadAdmin(admin.ModelAdmin):
     list_display = ('user', 'job_role', 'ats_score', 'created_at')
     list_filter = ('job_role', 'created_at', 'ats_score')
     search_fields = ('user__username', 'user__email', 'job_role')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('stage_timings', 'created_at', 'updated_at')
     ordering = ('-created_at',)
 
+@admin.register(ExtractedText)
+class ExtractedTextAdmin(admin.ModelAdmin):
+    list_display = ('file_hash', 'extractor_version', 'hit_count', 'created_at')
+    list_filter = ('extractor_version',)
+    search_fields = ('file_hash',)
+    readonly_fields = ('file_hash', 'extractor_version', 'hit_count', 'created_at')
+    ordering = ('-created_at',)
+
+@admin.register(CVAnalysis)
+class CVAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('file_hash', 'job_role', 'keyword_version', 'scorer_version', 'created_at')
+    list_filter = ('scorer_version',)
+    search_fields = ('file_hash', 'job_role')
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('cv_upload', 'status', 'attempts', 'worker', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('cv_upload__user__username', 'cv_upload__job_role')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'updated_at')
+    ordering = ('-created_at',)
+
+@admin.register(GeminiResponse)
+class GeminiResponseAdmin(admin.ModelAdmin):
+    list_display = ('method', 'model_name', 'hit_count', 'created_at', 'last_used_at', 'expires_at')
+    list_filter = ('method', 'model_name')
+    search_fields = ('cache_key',)
+    readonly_fields = ('cache_key', 'hit_count', 'created_at', 'last_used_at')
+    ordering = ('-last_used_at',)
+
+@admin.register(ApplicationGuide)
+class ApplicationGuideAdmin(admin.ModelAdmin):
+    list_display = ('job_title', 'company', 'portal', 'view_count', 'generated_at', 'last_viewed_at')
+    list_filter = ('portal',)
+    search_fields = ('job_title', 'company')
+    readonly_fields = ('title_key', 'company_key', 'portal_key', 'view_count', 'generated_at', 'last_viewed_at')
+    ordering = ('-view_count',)
+
 @admin.register(ATSKeyword)
 class ATSKeywordAdmin(admin.ModelAdmin):
     list_display = ('keyword', 'category', 'weight')
@@ -1,14 +1,21 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
+from asgiref.sync import sync_to_async
 from django.views.generic import DetailView, TemplateView, View
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils import timezone
 from .models import CVUpload
 from .gemini_service import GeminiCVAnalyzer
+from .gemini_async import AsyncGeminiCVAnalyzer
+from .gemini_schemas import SEARCH_CONFIG, extract_json
+from .metrics import increment
 from .job_matcher import JobMatcher
 from .utils import create_pdf_from_text
 import json
+import secrets
 
 class AIOptimizedCVView(LoginRequiredMixin, DetailView):
     model = CVUpload
@@ -99,9 +106,11 @@ class JobApplicationGuideView(LoginRequiredMixin, TemplateView):
             'url': self.request.GET.get('url', '')
         }
         
-        job_matcher = JobMatcher()
-        guide_data = job_matcher.get_application_guide(job_data)
-        resources = job_matcher.get_job_resources(job_data['title'])
+        from .guide_store import get_guide
+        
+        # Stored guides are served straight away; stale ones refresh in the background
+        guide_data = get_guide(job_data)
+        resources = JobMatcher().get_job_resources(job_data['title'])
         
         context.update({
             'job_data': job_data,
@@ -113,32 +122,33 @@ class JobApplicationGuideView(LoginRequiredMixin, TemplateView):
         
         return context
 
+def count_regeneration(cv_upload):
+    """Count a Regenerate Analysis request by what it replaces, to see how often fallbacks drive them"""
+    if not cv_upload.gemini_analysis:
+        previous = 'none'
+    else:
+        previous = 'degraded' if cv_upload.gemini_analysis.get('degraded') else 'ai'
+    increment('analysis_regenerations_total', previous=previous)
+
 class RegenerateAnalysisView(LoginRequiredMixin, View):
     def post(self, request, cv_id):
         cv_upload = get_object_or_404(CVUpload, id=cv_id, user=request.user)
+        count_regeneration(cv_upload)
         
         try:
-            from .utils import extract_text_from_file
+            from .text_cache import get_upload_text
             
-            cv_text = extract_text_from_file(cv_upload.original_cv.path)
-            gemini_analyzer = GeminiCVAnalyzer()
+            cv_text = get_upload_text(cv_upload)
+            # Regenerating must ask Gemini again rather than replay the cached answer
+            gemini_analyzer = GeminiCVAnalyzer(bypass_cache=True)
             
             # Get job description from request if provided
             job_description = request.POST.get('job_description', cv_upload.job_role)
             
-            analysis = gemini_analyzer.analyze_cv(cv_text, job_description)
+            analysis, optimized_content = gemini_analyzer.analyze_and_optimize(cv_text, job_description)
             
             # Update analysis results
-            cv_upload.gemini_analysis = analysis
-            cv_upload.ats_score = analysis.get('ats_score', 0)
-            cv_upload.missing_sections = analysis.get('missing_sections', [])
-            cv_upload.improvement_suggestions = analysis.get('improvements', [])
-            cv_upload.keyword_suggestions = analysis.get('keyword_suggestions', [])
-            cv_upload.job_match_percentage = analysis.get('job_match_percentage', 0)
-            
-            # Regenerate optimized content
-            optimized_content = gemini_analyzer.generate_optimized_cv(cv_text, analysis)
-            cv_upload.optimized_content = optimized_content
+            cv_upload.apply_gemini_analysis(analysis, optimized_content)
             
             cv_upload.save()
             
@@ -146,7 +156,8 @@ class RegenerateAnalysisView(LoginRequiredMixin, View):
                 'success': True,
                 'message': 'Analysis regenerated successfully!',
                 'ats_score': cv_upload.ats_score,
-                'match_percentage': cv_upload.job_match_percentage
+                'match_percentage': cv_upload.job_match_percentage,
+                'degraded': bool(analysis.get('degraded'))
             })
             
         except Exception as e:
@@ -155,6 +166,187 @@ class RegenerateAnalysisView(LoginRequiredMixin, View):
                 'message': f'Failed to regenerate analysis: {str(e)}'
             })
 
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    lines = [f'event: {event}'] if event else []
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+# Characters per event when replaying an optimized CV that is already stored
+STORED_CHUNK_CHARS = 400
+
+def stored_cv_events(optimized_content):
+    """Replay a stored optimized CV as the same events a Gemini stream sends"""
+    for start in range(0, len(optimized_content), STORED_CHUNK_CHARS):
+        yield sse_event({'text': optimized_content[start:start + STORED_CHUNK_CHARS]})
+    yield sse_event({'length': len(optimized_content)}, event='done')
+
+def save_streamed_cv(cv_id, optimized_content, replace=False):
+    """Store the text of a finished stream without overwriting the rest of the upload.
+    
+    Unless replace is set (a refresh the user asked for), an existing
+    optimized CV is kept.
+    """
+    uploads = CVUpload.objects.filter(pk=cv_id)
+    if not replace:
+        uploads = uploads.filter(optimized_content='')
+    uploads.update(optimized_content=optimized_content, updated_at=timezone.now())
+
+# Session key holding one-time tokens for stream refreshes, {token: cv_id}
+REFRESH_TOKENS_KEY = 'cv_stream_refresh_tokens'
+MAX_REFRESH_TOKENS = 10
+
+def issue_refresh_token(session, cv_id):
+    """Allow one refreshed stream of a CV; issued by a CSRF-checked POST"""
+    tokens = session.get(REFRESH_TOKENS_KEY, {})
+    token = secrets.token_urlsafe(16)
+    tokens[token] = cv_id
+    # Tokens never used (a closed tab) are dropped oldest first
+    session[REFRESH_TOKENS_KEY] = dict(list(tokens.items())[-MAX_REFRESH_TOKENS:])
+    return token
+
+def consume_refresh_token(session, cv_id, token):
+    """Use up a refresh token, returning whether it was issued for this CV"""
+    tokens = session.get(REFRESH_TOKENS_KEY, {})
+    if not token or tokens.get(token) != cv_id:
+        return False
+    del tokens[token]
+    session[REFRESH_TOKENS_KEY] = tokens
+    return True
+
+def event_stream_response(events):
+    """Wrap an event generator in a response that proxies pass through unbuffered"""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class StreamOptimizedCVView(LoginRequiredMixin, View):
+    """Stream the AI-optimized CV as Gemini writes it, saving the text once it is complete.
+    
+    A GET replays the stored optimized CV when there is one and only asks
+    Gemini for a missing one. Replacing it with a fresh Gemini version needs
+    a token from a POST, so another site cannot spend Gemini quota through
+    the user's session.
+    """
+    
+    def post(self, request, cv_id):
+        get_object_or_404(CVUpload, id=cv_id, user=request.user)
+        token = issue_refresh_token(request.session, cv_id)
+        return JsonResponse({'url': f'{request.path}?refresh={token}'})
+    
+    def get(self, request, cv_id):
+        from .text_cache import get_upload_text
+        
+        cv_upload = get_object_or_404(CVUpload, id=cv_id, user=request.user)
+        refresh = consume_refresh_token(request.session, cv_id, request.GET.get('refresh'))
+        gemini_analyzer = GeminiCVAnalyzer(bypass_cache=refresh)
+        
+        def events():
+            if not refresh and cv_upload.optimized_content:
+                yield from stored_cv_events(cv_upload.optimized_content)
+                return
+            chunks = []
+            try:
+                cv_text = get_upload_text(cv_upload)
+                analysis = cv_upload.gemini_analysis or gemini_analyzer.analyze_cv(cv_text, cv_upload.job_role)
+                for chunk in gemini_analyzer.stream_optimized_cv(cv_text, analysis):
+                    chunks.append(chunk)
+                    yield sse_event({'text': chunk})
+                save_streamed_cv(cv_upload.pk, ''.join(chunks), replace=refresh)
+            except Exception as e:
+                yield sse_event({'message': f'Failed to generate optimized CV: {str(e)}'}, event='error')
+                return
+            yield sse_event({'length': sum(len(chunk) for chunk in chunks)}, event='done')
+        
+        return event_stream_response(events())
+
+def custom_search_results(ai_response, job_title, location, skills):
+    """Build the custom job search payload from the Gemini reply"""
+    # JSON mode should give a bare object, but fenced or cut-off replies are still usable
+    search_data, repaired = extract_json(ai_response)
+    if isinstance(search_data, dict):
+        increment('gemini_replies_total', method='custom_job_search', outcome='repaired' if repaired else 'clean')
+    else:
+        increment('gemini_replies_total', method='custom_job_search', outcome='invalid')
+        search_data = {
+            'keywords': [job_title],
+            'alternative_titles': [job_title],
+            'skills': skills.split(',') if skills else [],
+            'salary_range': 'Competitive',
+            'companies': ['Top Companies']
+        }
+    
+    # Get real jobs using fallback method
+    jobs = [
+        {
+            'title': f'{job_title} Developer',
+            'company': 'Google',
+            'location': location or 'Remote',
+            'salary_range': '$80,000 - $120,000',
+            'experience_required': '2-4 years',
+            'description': f'We are looking for a skilled {job_title} to join our team...',
+            'job_url': f'https://careers.google.com/jobs/results/?q={job_title}',
+            'posted_date': '2024-01-15',
+            'job_type': 'Full-time',
+            'portal': 'Google Careers',
+            'match_percentage': '95'
+        },
+        {
+            'title': f'Senior {job_title}',
+            'company': 'Microsoft',
+            'location': location or 'Seattle',
+            'salary_range': '$100,000 - $150,000',
+            'experience_required': '5+ years',
+            'description': f'Join Microsoft as a Senior {job_title} and work on cutting-edge projects...',
+            'job_url': f'https://careers.microsoft.com/us/en/search-results?keywords={job_title}',
+            'posted_date': '2024-01-14',
+            'job_type': 'Full-time',
+            'portal': 'Microsoft Careers',
+            'match_percentage': '92'
+        },
+        {
+            'title': f'{job_title} Engineer',
+            'company': 'Amazon',
+            'location': location or 'Remote',
+            'salary_range': '$90,000 - $130,000',
+            'experience_required': '3-5 years',
+            'description': f'Amazon is hiring {job_title} Engineers for various teams...',
+            'job_url': f'https://amazon.jobs/en/search?base_query={job_title}',
+            'posted_date': '2024-01-13',
+            'job_type': 'Full-time',
+            'portal': 'Amazon Jobs',
+            'match_percentage': '88'
+        },
+        {
+            'title': f'{job_title} Specialist',
+            'company': 'Meta',
+            'location': location or 'Menlo Park',
+            'salary_range': '$110,000 - $160,000',
+            'experience_required': '4-6 years',
+            'description': f'Meta is seeking a {job_title} Specialist to drive innovation...',
+            'job_url': f'https://www.metacareers.com/jobs/?q={job_title}',
+            'posted_date': '2024-01-12',
+            'job_type': 'Full-time',
+            'portal': 'Meta Careers',
+            'match_percentage': '90'
+        }
+    ]
+    
+    job_results = {
+        'jobs': jobs,
+        'total_found': len(jobs),
+        'search_suggestions': []
+    }
+    
+    return {
+        'success': True,
+        'search_data': search_data,
+        'jobs': job_results['jobs'],
+        'total_found': job_results['total_found'],
+        'search_suggestions': job_results['search_suggestions']
+    }
+
 class CustomJobSearchView(LoginRequiredMixin, TemplateView):
     template_name = 'cv_optimizer/custom_job_search.html'
     
@@ -180,114 +372,161 @@ class CustomJobSearchView(LoginRequiredMixin, TemplateView):
                 cv_analysis = cv_upload.gemini_analysis or {}
             
             # Use Gemini to generate intelligent job search
-            search_prompt = f"""
-            Generate a smart job search for:
-            Job Title: {job_title}
-            Location: {location}
-            Skills: {skills}
-            Experience: {experience}
-            CV Analysis: {cv_analysis}
+            search_prompt = gemini_analyzer.custom_job_search_prompt(job_title, location, skills, experience, cv_analysis)
+            ai_response = gemini_analyzer.generate_text('custom_job_search', search_prompt, SEARCH_CONFIG)
             
-            Provide:
-            1. Optimized search keywords
-            2. Alternative job titles to search
-            3. Required skills to highlight
-            4. Salary expectations
-            5. Company recommendations
+            return JsonResponse(custom_search_results(ai_response, job_title, location, skills))
             
-            Return as JSON format.
-            """
-            
-            ai_response = gemini_analyzer.model.generate_content(search_prompt).text
-            
-            # Parse AI response
-            import json
-            try:
-                search_data = json.loads(ai_response)
-            except:
-                search_data = {
-                    'keywords': [job_title],
-                    'alternative_titles': [job_title],
-                    'skills': skills.split(',') if skills else [],
-                    'salary_range': 'Competitive',
-                    'companies': ['Top Companies']
-                }
-            
-            # Get real jobs using fallback method
-            import requests
-            from datetime import datetime
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            })
+
+class AsyncLoginRequiredMixin:
+    """LoginRequiredMixin for async views, loading the session user off the event loop"""
+    
+    async def dispatch(self, request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super().dispatch(request, *args, **kwargs)
+
+class AsyncJobMatchingView(AsyncLoginRequiredMixin, View):
+    async def get(self, request, cv_id):
+        cv_upload = await sync_to_async(get_object_or_404)(CVUpload, id=cv_id, user=request.user)
+        location = request.GET.get('location', '')
+        
+        job_suggestions = await AsyncGeminiCVAnalyzer().find_matching_jobs(cv_upload.gemini_analysis, location)
+        job_results = JobMatcher().jobs_for_suggestions(job_suggestions, location)
+        
+        context = {
+            'cv_upload': cv_upload,
+            'object': cv_upload,
+            'jobs': job_results['jobs'],
+            'search_suggestions': job_results['search_suggestions'],
+            'total_jobs': job_results['total_found'],
+            'location': location
+        }
+        # Templates read request.user, so rendering stays off the event loop
+        return await sync_to_async(render)(request, 'cv_optimizer/job_matching.html', context)
+
+class AsyncJobApplicationGuideView(AsyncLoginRequiredMixin, View):
+    async def get(self, request):
+        job_data = {
+            'title': request.GET.get('title', ''),
+            'company': request.GET.get('company', ''),
+            'portal': request.GET.get('portal', ''),
+            'url': request.GET.get('url', '')
+        }
+        
+        from .guide_store import find_guide, guide_context, record_view, store_guide
+        
+        guide = await sync_to_async(find_guide)(job_data)
+        if guide is None:
+            text = await AsyncGeminiCVAnalyzer().get_application_guide(job_data['title'], job_data['company'])
+            guide = await sync_to_async(store_guide)(job_data, text)
+            await sync_to_async(record_view)(guide)
+        guide_data = guide_context(guide)
+        
+        context = {
+            'job_data': job_data,
+            'guide': guide_data['guide'],
+            'portal_tips': guide_data['portal_specific_tips'],
+            'checklist': guide_data['application_checklist'],
+            'resources': JobMatcher().get_job_resources(job_data['title'])
+        }
+        return await sync_to_async(render)(request, 'cv_optimizer/application_guide.html', context)
+
+class AsyncRegenerateAnalysisView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, cv_id):
+        from .text_cache import get_upload_text
+        
+        cv_upload = await sync_to_async(get_object_or_404)(CVUpload, id=cv_id, user=request.user)
+        count_regeneration(cv_upload)
+        
+        try:
+            cv_text = await sync_to_async(get_upload_text)(cv_upload)
+            job_description = request.POST.get('job_description', cv_upload.job_role)
             
-            jobs = [
-                {
-                    'title': f'{job_title} Developer',
-                    'company': 'Google',
-                    'location': location or 'Remote',
-                    'salary_range': '$80,000 - $120,000',
-                    'experience_required': '2-4 years',
-                    'description': f'We are looking for a skilled {job_title} to join our team...',
-                    'job_url': f'https://careers.google.com/jobs/results/?q={job_title}',
-                    'posted_date': '2024-01-15',
-                    'job_type': 'Full-time',
-                    'portal': 'Google Careers',
-                    'match_percentage': '95'
-                },
-                {
-                    'title': f'Senior {job_title}',
-                    'company': 'Microsoft',
-                    'location': location or 'Seattle',
-                    'salary_range': '$100,000 - $150,000',
-                    'experience_required': '5+ years',
-                    'description': f'Join Microsoft as a Senior {job_title} and work on cutting-edge projects...',
-                    'job_url': f'https://careers.microsoft.com/us/en/search-results?keywords={job_title}',
-                    'posted_date': '2024-01-14',
-                    'job_type': 'Full-time',
-                    'portal': 'Microsoft Careers',
-                    'match_percentage': '92'
-                },
-                {
-                    'title': f'{job_title} Engineer',
-                    'company': 'Amazon',
-                    'location': location or 'Remote',
-                    'salary_range': '$90,000 - $130,000',
-                    'experience_required': '3-5 years',
-                    'description': f'Amazon is hiring {job_title} Engineers for various teams...',
-                    'job_url': f'https://amazon.jobs/en/search?base_query={job_title}',
-                    'posted_date': '2024-01-13',
-                    'job_type': 'Full-time',
-                    'portal': 'Amazon Jobs',
-                    'match_percentage': '88'
-                },
-                {
-                    'title': f'{job_title} Specialist',
-                    'company': 'Meta',
-                    'location': location or 'Menlo Park',
-                    'salary_range': '$110,000 - $160,000',
-                    'experience_required': '4-6 years',
-                    'description': f'Meta is seeking a {job_title} Specialist to drive innovation...',
-                    'job_url': f'https://www.metacareers.com/jobs/?q={job_title}',
-                    'posted_date': '2024-01-12',
-                    'job_type': 'Full-time',
-                    'portal': 'Meta Careers',
-                    'match_percentage': '90'
-                }
-            ]
+            gemini_analyzer = AsyncGeminiCVAnalyzer(bypass_cache=True)
+            analysis, optimized_content = await gemini_analyzer.analyze_and_optimize(cv_text, job_description)
             
-            job_results = {
-                'jobs': jobs,
-                'total_found': len(jobs),
-                'search_suggestions': []
-            }
+            cv_upload.apply_gemini_analysis(analysis, optimized_content)
+            await sync_to_async(cv_upload.save)()
             
             return JsonResponse({
                 'success': True,
-                'search_data': search_data,
-                'jobs': job_results['jobs'],
-                'total_found': job_results['total_found'],
-                'search_suggestions': job_results['search_suggestions']
+                'message': 'Analysis regenerated successfully!',
+                'ats_score': cv_upload.ats_score,
+                'match_percentage': cv_upload.job_match_percentage,
+                'degraded': bool(analysis.get('degraded'))
+            })
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Failed to regenerate analysis: {str(e)}'
             })
+
+class AsyncCustomJobSearchView(AsyncLoginRequiredMixin, View):
+    async def get(self, request):
+        user_cvs = await sync_to_async(list)(CVUpload.objects.filter(user=request.user)[:5])
+        return await sync_to_async(render)(request, 'cv_optimizer/custom_job_search.html', {'user_cvs': user_cvs})
+    
+    async def post(self, request):
+        job_title = request.POST.get('job_title', '')
+        location = request.POST.get('location', '')
+        cv_id = request.POST.get('cv_id')
+        skills = request.POST.get('skills', '')
+        experience = request.POST.get('experience', '')
+        
+        try:
+            gemini_analyzer = AsyncGeminiCVAnalyzer()
             
+            cv_analysis = {}
+            if cv_id:
+                cv_upload = await sync_to_async(get_object_or_404)(CVUpload, id=cv_id, user=request.user)
+                cv_analysis = cv_upload.gemini_analysis or {}
+            
+            search_prompt = gemini_analyzer.custom_job_search_prompt(job_title, location, skills, experience, cv_analysis)
+            ai_response = await gemini_analyzer.generate_text('custom_job_search', search_prompt, SEARCH_CONFIG)
+            
+            return JsonResponse(custom_search_results(ai_response, job_title, location, skills))
         except Exception as e:
             return JsonResponse({
                 'success': False,
                 'error': str(e)
-            })
\ No newline at end of file
+            })
+
+class AsyncStreamOptimizedCVView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, cv_id):
+        await sync_to_async(get_object_or_404)(CVUpload, id=cv_id, user=request.user)
+        token = await sync_to_async(issue_refresh_token)(request.session, cv_id)
+        return JsonResponse({'url': f'{request.path}?refresh={token}'})
+    
+    async def get(self, request, cv_id):
+        from .text_cache import get_upload_text
+        
+        cv_upload = await sync_to_async(get_object_or_404)(CVUpload, id=cv_id, user=request.user)
+        refresh = await sync_to_async(consume_refresh_token)(request.session, cv_id, request.GET.get('refresh'))
+        gemini_analyzer = AsyncGeminiCVAnalyzer(bypass_cache=refresh)
+        
+        async def events():
+            if not refresh and cv_upload.optimized_content:
+                for event in stored_cv_events(cv_upload.optimized_content):
+                    yield event
+                return
+            chunks = []
+            try:
+                cv_text = await sync_to_async(get_upload_text)(cv_upload)
+                analysis = cv_upload.gemini_analysis or await gemini_analyzer.analyze_cv(cv_text, cv_upload.job_role)
+                async for chunk in gemini_analyzer.stream_optimized_cv(cv_text, analysis):
+                    chunks.append(chunk)
+                    yield sse_event({'text': chunk})
+                await sync_to_async(save_streamed_cv)(cv_upload.pk, ''.join(chunks), replace=refresh)
+            except Exception as e:
+                yield sse_event({'message': f'Failed to generate optimized CV: {str(e)}'}, event='error')
+                return
+            yield sse_event({'length': sum(len(chunk) for chunk in chunks)}, event='done')
+        
+        return event_stream_response(events())
@@ -0,0 +1,114 @@
+import logging
+from datetime import timedelta
+from django.db.models import F
+from django.utils import timezone
+from .metrics import increment, process_name, record_timings, span
+from .models import AnalysisJob, CVUpload
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['extracting', 'scoring', 'optimizing']
+# Shown to the user after 'Analysis failed: '; the details only go to the server log
+UNREADABLE_ERROR = 'the text of this CV could not be read. Please check the file and upload it again.'
+FAILED_ERROR = 'something went wrong while analyzing this CV. Please try again later.'
+
+def worker_name():
+    """Identify this worker process in claimed jobs"""
+    return process_name()
+
+def enqueue_analysis(cv_upload):
+    """Queue a background analysis of an upload"""
+    return AnalysisJob.objects.create(cv_upload=cv_upload)
+
+def set_status(job, status, **fields):
+    """Move a job to a new status without touching the rest of the row"""
+    fields.update(status=status, updated_at=timezone.now())
+    AnalysisJob.objects.filter(pk=job.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+def claim_next_job(worker):
+    """Claim the oldest queued job, or return None when the queue is empty.
+
+    The claim is a conditional UPDATE, so when several workers race for the
+    same row exactly one of them sees it change and the rest move on.
+    """
+    while True:
+        job_id = AnalysisJob.objects.filter(status='queued').order_by('created_at', 'pk').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = AnalysisJob.objects.filter(pk=job_id, status='queued').update(
+            status='extracting', worker=worker, attempts=F('attempts') + 1,
+            started_at=now, updated_at=now, error=''
+        )
+        if claimed:
+            return AnalysisJob.objects.select_related('cv_upload').get(pk=job_id)
+
+def requeue_stale_jobs(stale_after, max_attempts):
+    """Return jobs abandoned by a crashed worker to the queue, failing those out of attempts"""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = AnalysisJob.objects.filter(status__in=ACTIVE_STATUSES, updated_at__lt=cutoff)
+    now = timezone.now()
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed', error='Worker stopped before the analysis finished', finished_at=now, updated_at=now
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status='queued', worker='', updated_at=now)
+    return requeued, failed
+
+def run_job(job):
+    """Extract, score and optimize the upload of a claimed job, recording its stage timings"""
+    with record_timings() as timings:
+        with span('job_total'):
+            ok = _run_stages(job)
+    job.cv_upload.stage_timings = timings
+    CVUpload.objects.filter(pk=job.cv_upload_id).update(stage_timings=timings)
+    increment('analysis_jobs_total', status=job.status)
+    return ok
+
+def _run_stages(job):
+    from .analysis_store import get_analysis
+    from .gemini_service import GeminiCVAnalyzer
+    from .text_cache import get_upload_text
+    from .utils import is_extraction_error
+
+    cv_upload = job.cv_upload
+    try:
+        cv_text = get_upload_text(cv_upload)
+        if is_extraction_error(cv_text):
+            logger.warning('Analysis job %s could not read upload %s: %s', job.pk, cv_upload.pk, cv_text)
+            set_status(job, 'failed', error=UNREADABLE_ERROR, finished_at=timezone.now())
+            return False
+
+        set_status(job, 'scoring')
+        # Stores the local ATS analysis so the analysis page opens without parsing
+        get_analysis(cv_upload)
+
+        set_status(job, 'optimizing')
+        gemini_analyzer = GeminiCVAnalyzer()
+        analysis, optimized_content = gemini_analyzer.analyze_and_optimize(cv_text, cv_upload.job_role)
+
+        cv_upload.apply_gemini_analysis(analysis, optimized_content)
+        cv_upload.save()
+    except Exception:
+        logger.exception('Analysis job %s failed', job.pk)
+        set_status(job, 'failed', error=FAILED_ERROR, finished_at=timezone.now())
+        return False
+
+    set_status(job, 'done', finished_at=timezone.now())
+    return True
+
+def job_status(job):
+    """Get the polling payload for a job"""
+    from django.urls import reverse
+
+    data = {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'error': job.error,
+    }
+    if job.status == 'done':
+        data['redirect_url'] = reverse('cv_optimizer:ai_optimized', args=[job.cv_upload_id])
+    return data
@@ -0,0 +1,34 @@
+from .models import CVUpload, CVAnalysis
+from .utils import SCORER_VERSION, analyze_cv, get_keyword_version
+from .keyword_index import get_keyword_index
+from .text_cache import get_upload_text
+
+def analysis_key(cv_upload, job_keywords, weights):
+    """Build the lookup fields identifying the stored analysis of an upload"""
+    return {
+        'file_hash': cv_upload.file_hash,
+        'job_role': cv_upload.job_role.strip().lower(),
+        'keyword_version': get_keyword_version(job_keywords, weights),
+        'scorer_version': SCORER_VERSION
+    }
+
+def get_analysis(cv_upload):
+    """Return the local ATS analysis of an upload, recomputing only when its inputs change"""
+    job_keywords, weights = get_keyword_index().keywords_for_role(cv_upload.job_role)
+    if cv_upload.file_hash:
+        result = CVAnalysis.objects.filter(**analysis_key(cv_upload, job_keywords, weights)).values_list('result', flat=True).first()
+        if result is not None:
+            result['job_role'] = cv_upload.job_role
+            return result
+
+    # Extraction records the file hash on uploads created before hashing existed
+    cv_text = get_upload_text(cv_upload)
+    analysis = analyze_cv(cv_upload.original_cv.path, cv_upload.job_role, cv_text, job_keywords, weights)
+    if 'error' in analysis:
+        return analysis
+
+    CVAnalysis.objects.get_or_create(**analysis_key(cv_upload, job_keywords, weights), defaults={'result': analysis})
+    if cv_upload.ats_score != analysis['score']:
+        cv_upload.ats_score = analysis['score']
+        CVUpload.objects.filter(pk=cv_upload.pk).update(ats_score=analysis['score'])
+    return analysis
@@ -0,0 +1,118 @@
+import hashlib
+import numpy as np
+from scipy import sparse
+from .keyword_matcher import get_matcher
+from .utils import (
+    JOB_KEYWORDS, DEFAULT_KEYWORDS, calculate_ats_score, extract_text_from_file,
+    is_extraction_error
+)
+
+def get_role_keywords(include_db=True):
+    """Get {role: (keywords, weights)} for every built-in role and ATSKeyword category"""
+    if include_db:
+        from .keyword_index import get_keyword_index
+        return get_keyword_index().all_roles()
+
+    role_keywords = {}
+    for role, keywords in JOB_KEYWORDS.items():
+        keywords = keywords + DEFAULT_KEYWORDS
+        role_keywords[role] = (tuple(keywords), (1,) * len(keywords))
+    return role_keywords
+
+class ScoreMatrix:
+    """ATS scores of many CVs against many roles.
+
+    ``scores[i, j]`` is the weighted score of CV ``i`` for ``roles[j]`` with
+    the same semantics as calculate_ats_score; ``result()`` rebuilds the
+    full dict.
+    """
+
+    def __init__(self, roles, role_keywords, vocabulary, matches, scores):
+        self.roles = roles
+        self.role_keywords = role_keywords
+        self.vocabulary = vocabulary
+        self.matches = matches
+        self.scores = scores
+        self._role_index = {role: index for index, role in enumerate(roles)}
+
+    def result(self, cv_index, role):
+        """Get the calculate_ats_score-style result for one CV and role"""
+        job_keywords = self.role_keywords[role][0]
+        row = self.matches.indices[self.matches.indptr[cv_index]:self.matches.indptr[cv_index + 1]]
+        matched = {self.vocabulary[index] for index in row}
+        return {
+            'score': float(self.scores[cv_index, self._role_index[role]]),
+            'matched_keywords': [kw for kw in job_keywords if kw in matched],
+            'total_keywords': len(job_keywords),
+            'missing_keywords': [kw for kw in job_keywords if kw not in matched]
+        }
+
+    def best_roles(self, cv_index, top=3):
+        """Get the highest scoring (role, score) pairs for one CV"""
+        order = np.argsort(-self.scores[cv_index], kind='stable')[:top]
+        return [(self.roles[index], float(self.scores[cv_index, index])) for index in order]
+
+def build_score_matrix(cv_texts, role_keywords=None):
+    """Score every CV text against every role in one sparse matrix product"""
+    if role_keywords is None:
+        role_keywords = get_role_keywords()
+    roles = list(role_keywords)
+    vocabulary = sorted({kw for keywords, _ in role_keywords.values() for kw in keywords})
+    matcher = get_matcher(vocabulary)
+
+    # CVs x keywords: 1 where the keyword occurs anywhere in the CV
+    indptr = [0]
+    indices = []
+    for cv_text in cv_texts:
+        matched = sorted({index for index, _, _ in matcher.iter_matches(cv_text)})
+        indices.extend(matched)
+        indptr.append(len(indices))
+    matches = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(vocabulary))
+    )
+
+    # Keywords x roles: summed weight of each keyword in the role's list
+    vocabulary_index = {kw: index for index, kw in enumerate(vocabulary)}
+    rows, columns, data = [], [], []
+    for column, role in enumerate(roles):
+        keywords, weights = role_keywords[role]
+        for kw, weight in zip(keywords, weights):
+            rows.append(vocabulary_index[kw])
+            columns.append(column)
+            data.append(weight)
+    membership = sparse.csc_matrix(
+        (np.array(data, dtype=np.float64), (rows, columns)),
+        shape=(len(vocabulary), len(roles))
+    )
+
+    totals = np.array([sum(role_keywords[role][1]) for role in roles], dtype=np.float64)
+    matched_counts = (matches @ membership).toarray()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(totals > 0, matched_counts / totals * 100, 0.0)
+    scores = np.round(np.minimum(scores, 100), 2)
+
+    return ScoreMatrix(roles, role_keywords, vocabulary, matches, scores)
+
+def rescore_row(row):
+    """Score one CV in a pool worker; the file is only read when no cached text is given.
+
+    Takes ``(pk, file_path, job_keywords, weights, cv_text)`` and returns
+    ``(pk, score, extracted_text, file_hash)``. Extraction results come back
+    so the parent can cache them; a score of None means extraction failed.
+    """
+    pk, file_path, job_keywords, weights, cv_text = row
+    extracted_text = file_hash = None
+
+    if cv_text is None:
+        try:
+            with open(file_path, 'rb') as file:
+                file_hash = hashlib.sha256(file.read()).hexdigest()
+        except OSError:
+            return pk, None, None, None
+        cv_text = extracted_text = extract_text_from_file(file_path)
+        if is_extraction_error(cv_text):
+            return pk, None, None, file_hash
+
+    score = calculate_ats_score(cv_text, job_keywords, weights)['score']
+    return pk, score, extracted_text, file_hash
@@ -0,0 +1,465 @@
+import html
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from .keyword_matcher import KeywordMatcher, KeywordScanner, get_matcher
+
+WORDS = [
+    'python', 'java', 'javascript', 'react', 'django', 'sql', 'git', 'agile', 'api',
+    'database', 'frontend', 'backend', 'cloud', 'aws', 'docker', 'kubernetes', 'linux',
+    'analysis', 'design', 'testing', 'leadership', 'communication', 'team', 'project',
+    'management', 'customer', 'delivery', 'research', 'statistics', 'learning', 'data',
+    'marketing', 'sales', 'budget', 'planning', 'security', 'network', 'mobile', 'web',
+    'developed', 'implemented', 'improved', 'reduced', 'increased', 'led', 'built',
+    'the', 'and', 'for', 'with', 'on', 'in', 'of', 'to', 'a', 'by', 'across', 'using'
+]
+
+def legacy_ats_matches(cv_text, job_keywords):
+    """Keyword matching as calculate_ats_score did it before the automaton"""
+    cv_text_lower = cv_text.lower()
+    matched_keywords = []
+    for keyword in job_keywords:
+        if keyword.lower() in cv_text_lower:
+            matched_keywords.append(keyword)
+    missing_keywords = [kw for kw in job_keywords if kw.lower() not in cv_text_lower]
+    return matched_keywords, missing_keywords
+
+def synthetic_keywords(count, rng):
+    """Generate distinct one- to three-word keywords"""
+    keywords = set()
+    while len(keywords) < count:
+        length = rng.choice((1, 1, 2, 3))
+        words = [rng.choice(WORDS) for _ in range(length)]
+        if length == 1:
+            words.append(str(rng.randint(1, count)))
+        keywords.add(' '.join(words))
+    return sorted(keywords)
+
+def synthetic_cv_text(word_count, rng):
+    """Generate CV-like text of roughly the given length"""
+    lines = []
+    for _ in range(0, word_count, 12):
+        lines.append('• ' + ' '.join(rng.choice(WORDS) for _ in range(12)))
+    return '\n'.join(lines)
+
+def _time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def bench_keywords(keyword_counts=(10, 27, 40, 60, 200, 2000), word_count=800, repeat=5, seed=42):
+    """Compare the keyword scanner and automaton against per-keyword substring scans.
+
+    27 keywords is the size of a typical role list. matcher is the one
+    get_matcher picks for the list size, and speedup is legacy over it, so
+    values below 1 mean the new path is slower than the old substring scan.
+    Every keyword here occurs in the text, the worst case for the scanner.
+    """
+    rng = random.Random(seed)
+    cv_text = synthetic_cv_text(word_count, rng)
+    results = []
+
+    for count in keyword_counts:
+        keywords = synthetic_keywords(count, rng)
+
+        build_start = time.perf_counter()
+        KeywordMatcher(keywords)
+        build_time = time.perf_counter() - build_start
+        automaton = KeywordMatcher(keywords)
+        scanner = KeywordScanner(keywords)
+        matcher = get_matcher(keywords)
+
+        legacy_time = _time(lambda: legacy_ats_matches(cv_text, keywords), repeat)
+        automaton_time = _time(lambda: automaton.find_positions(cv_text), repeat)
+        scanner_time = _time(lambda: scanner.find_positions(cv_text), repeat)
+        matcher_time = _time(lambda: matcher.find_positions(cv_text), repeat)
+        results.append({
+            'keywords': count,
+            'cv_words': word_count,
+            'build_ms': round(build_time * 1000, 3),
+            'legacy_ms': round(legacy_time * 1000, 3),
+            'automaton_ms': round(automaton_time * 1000, 3),
+            'scanner_ms': round(scanner_time * 1000, 3),
+            'matcher': type(matcher).__name__,
+            'matcher_ms': round(matcher_time * 1000, 3),
+            'speedup': round(legacy_time / matcher_time, 2) if matcher_time else None
+        })
+    return results
+
+# Imports cv_optimizer.utils paid at module load before NLTK was dropped; needs nltk, which is no
+# longer a requirement, installed by hand (pip install nltk) to compare against
+LEGACY_IMPORTS = 'import nltk; from nltk.corpus import stopwords; from nltk.tokenize import word_tokenize; import PyPDF2, docx'
+
+def _import_time(statement):
+    code = f'import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)'
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=project_dir, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f'exited with code {result.returncode}')
+    return float(result.stdout.strip().splitlines()[-1])
+
+def bench_startup(repeat=5):
+    """Time a cold import of cv_optimizer.utils in fresh interpreters"""
+    results = []
+    for label, statement in (('cv_optimizer.utils', 'import cv_optimizer.utils'), ('legacy_imports', LEGACY_IMPORTS)):
+        try:
+            timings = sorted(_import_time(statement) for _ in range(repeat))
+        except RuntimeError as e:
+            # Reported rather than dropped, so a missing package does not read as a zero-run result
+            results.append({'import': label, 'runs': 0, 'median_ms': None, 'unavailable': str(e)})
+            continue
+        results.append({
+            'import': label,
+            'runs': len(timings),
+            'median_ms': round(timings[len(timings) // 2] * 1000, 2)
+        })
+    return results
+
+def bench_matrix(cv_counts=(100, 1000, 5000), word_count=600, repeat=3, seed=42):
+    """Compare the sparse CV x role score matrix against per-pair scoring"""
+    from .batch_scoring import build_score_matrix, get_role_keywords
+    from .utils import calculate_ats_score
+
+    rng = random.Random(seed)
+    role_keywords = get_role_keywords(include_db=False)
+    texts = [synthetic_cv_text(word_count, rng) for _ in range(max(cv_counts))]
+    results = []
+
+    for count in cv_counts:
+        sample = texts[:count]
+        matrix_time = _time(lambda: build_score_matrix(sample, role_keywords), repeat)
+        loop_time = _time(lambda: [
+            calculate_ats_score(text, keywords, weights) for text in sample for keywords, weights in role_keywords.values()
+        ], 1)
+        results.append({
+            'cvs': count,
+            'roles': len(role_keywords),
+            'matrix_s': round(matrix_time, 3),
+            'per_pair_s': round(loop_time, 3),
+            'speedup': round(loop_time / matrix_time, 2) if matrix_time else None
+        })
+    return results
+
+def write_synthetic_pdf(file_path, pages, rng, words_per_page=350):
+    """Write a multi-page CV-like PDF with reportlab"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(file_path, pagesize=letter)
+    for _ in range(pages):
+        y = 750
+        for line in synthetic_cv_text(words_per_page, rng).split('\n'):
+            pdf.drawString(40, y, line)
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+
+def bench_pdf_engines(page_counts=(2, 40), repeat=3, seed=42):
+    """Time every installed PDF engine, serially and with page fan-out"""
+    from .pdf_reader import available_engines, iter_pdf_pages, read_pdf_text
+
+    rng = random.Random(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in page_counts:
+            file_path = os.path.join(directory, f'cv_{pages}.pdf')
+            write_synthetic_pdf(file_path, pages, rng)
+            for engine in available_engines():
+                serial = _time(lambda: '\n'.join(iter_pdf_pages(file_path, engine=engine)), repeat)
+                parallel = _time(lambda: read_pdf_text(file_path, engine=engine, parallel_min_pages=1), repeat)
+                results.append({
+                    'engine': engine,
+                    'pages': pages,
+                    'serial_ms': round(serial * 1000, 2),
+                    'parallel_ms': round(parallel * 1000, 2),
+                    'workers': os.cpu_count()
+                })
+    return results
+
+CORPUS_HEADINGS = ['Professional Summary', 'Work Experience', 'Education', 'Technical Skills', 'Projects']
+
+def synthetic_cv_lines(word_count, rng):
+    """Generate CV lines with contact details and section headings"""
+    lines = ['Jane Doe', 'jane.doe@example.com | +1 5550123456']
+    per_section = max(word_count // len(CORPUS_HEADINGS), 12)
+    for heading in CORPUS_HEADINGS:
+        lines.append(heading)
+        lines.extend(synthetic_cv_text(per_section, rng).split('\n'))
+    return lines
+
+def synthetic_table_rows(rows, rng, columns=4):
+    """Generate skill-matrix style table rows"""
+    return [[' '.join(rng.choice(WORDS) for _ in range(3)) for _ in range(columns)] for _ in range(rows)]
+
+def write_corpus_pdf(file_path, lines, rng, tables=0):
+    """Write CV lines, and optionally tables, to a PDF with reportlab"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+    style = getSampleStyleSheet()['Normal']
+    story = [Paragraph(html.escape(line), style) for line in lines]
+    for _ in range(tables):
+        story.append(Table(synthetic_table_rows(12, rng)))
+    SimpleDocTemplate(file_path, pagesize=letter).build(story)
+
+def write_corpus_docx(file_path, lines, rng, tables=0):
+    """Write CV lines, and optionally tables, to a DOCX with python-docx"""
+    from docx import Document
+
+    document = Document()
+    for line in lines:
+        if line in CORPUS_HEADINGS:
+            document.add_heading(line, level=2)
+        else:
+            document.add_paragraph(line)
+    for _ in range(tables):
+        rows = synthetic_table_rows(12, rng)
+        table = document.add_table(rows=len(rows), cols=len(rows[0]))
+        for row, values in zip(table.rows, rows):
+            for cell, value in zip(row.cells, values):
+                cell.text = value
+    document.save(file_path)
+
+# name -> (writer, words, tables); 'many_pages' runs past the default page cap
+CORPUS = {
+    'short.pdf': (write_corpus_pdf, 300, 0),
+    'long.pdf': (write_corpus_pdf, 2000, 0),
+    'tables.pdf': (write_corpus_pdf, 400, 8),
+    'many_pages.pdf': (write_corpus_pdf, 20000, 0),
+    'short.docx': (write_corpus_docx, 300, 0),
+    'long.docx': (write_corpus_docx, 2000, 0),
+    'tables.docx': (write_corpus_docx, 400, 8),
+}
+
+def build_corpus(directory, seed=42):
+    """Write the synthetic CV corpus and return {name: path}"""
+    rng = random.Random(seed)
+    paths = {}
+    for name, (writer, words, tables) in CORPUS.items():
+        paths[name] = os.path.join(directory, name)
+        writer(paths[name], synthetic_cv_lines(words, rng), rng, tables)
+    return paths
+
+def _percentile(timings, percent):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+def _latencies(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def bench_analysis(repeat=5, seed=42, job_role='software developer'):
+    """Time each analysis stage over a synthetic PDF and DOCX corpus"""
+    from .utils import (
+        analyze_cv, analyze_cv_structure, calculate_ats_score, extract_text_from_file, get_job_keywords
+    )
+
+    job_keywords = get_job_keywords(job_role)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, file_path in build_corpus(directory, seed).items():
+            cv_text = extract_text_from_file(file_path)
+            # The full pipeline bypasses the text cache so every run parses the file
+            stages = {
+                'extract': lambda: extract_text_from_file(file_path),
+                'ats_score': lambda: calculate_ats_score(cv_text, job_keywords),
+                'structure': lambda: analyze_cv_structure(cv_text),
+                'analyze_cv': lambda: analyze_cv(file_path, job_role, extract_text_from_file(file_path), job_keywords),
+            }
+            for stage, func in stages.items():
+                timings = _latencies(func, repeat)
+                results.append({
+                    'stage': stage,
+                    'document': name,
+                    'words': len(cv_text.split()),
+                    'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+                    'p95_ms': round(_percentile(timings, 95) * 1000, 3),
+                    'per_s': round(len(timings) / sum(timings), 1) if sum(timings) else None
+                })
+    return results
+
+def bench_gemini_modes(repeat=3, seed=42, job_role='Software Developer'):
+    """Compare latency and tokens of the combined Gemini call against the two-call path"""
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+    from django.test.utils import override_settings
+    from .gemini_service import GeminiCVAnalyzer
+
+    if settings.GEMINI_BACKEND == 'google' and not settings.GEMINI_API_KEY:
+        raise ImproperlyConfigured('Set GEMINI_API_KEY, or GEMINI_BACKEND=fake, to benchmark Gemini calls')
+
+    cv_text = '\n'.join(synthetic_cv_lines(600, random.Random(seed)))
+    results = []
+    for mode, combined in (('two_call', False), ('combined', True)):
+        # Identical prompts every run, so the response cache must stay out of the way
+        with override_settings(GEMINI_COMBINED_ANALYSIS=combined, GEMINI_CACHE_ENABLED=False):
+            analyzer = GeminiCVAnalyzer()
+            timings = _latencies(lambda: analyzer.analyze_and_optimize(cv_text, job_role), repeat)
+        usage = analyzer.usage
+        results.append({
+            'mode': mode,
+            'calls': round(usage['calls'] / repeat, 2),
+            'p50_s': round(_percentile(timings, 50), 3),
+            'p95_s': round(_percentile(timings, 95), 3),
+            'prompt_tokens': usage['prompt_token_count'] // repeat,
+            'output_tokens': usage['candidates_token_count'] // repeat
+        })
+    return results
+
+def bench_gemini_client(repeat=5, calls=100):
+    """Time the Gemini setup each request pays with a freshly configured client against the shared model.
+
+    No API call is made, so the TLS handshake a fresh client also pays on
+    its first request is not included.
+    """
+    import google.generativeai as genai
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from google.generativeai.client import get_default_generative_client
+    from .gemini_service import GeminiCVAnalyzer, reset_gemini_model
+
+    def fresh_client():
+        # What GeminiCVAnalyzer() did per request, plus the client its first call then built
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        genai.GenerativeModel(GeminiCVAnalyzer.model_name)
+        get_default_generative_client()
+
+    def shared_client():
+        GeminiCVAnalyzer()
+        get_default_generative_client()
+
+    results = []
+    for mode, func in (('per_request', fresh_client), ('shared', shared_client)):
+        reset_gemini_model()
+        # Building a client needs a key, but nothing is sent with it
+        with override_settings(GEMINI_BACKEND='google', GEMINI_API_KEY=settings.GEMINI_API_KEY or 'benchmark'):
+            timings = _latencies(func, repeat * calls)
+        results.append({
+            'mode': mode,
+            'calls': len(timings),
+            'p50_us': round(_percentile(timings, 50) * 1e6, 1),
+            'p95_us': round(_percentile(timings, 95) * 1e6, 1)
+        })
+    reset_gemini_model()
+    return results
+
+def _load_scenarios(cv_text, job_role):
+    from .gemini_service import DEGRADED_GUIDE, GeminiCVAnalyzer
+    from .job_matcher import JobMatcher
+
+    def upload():
+        # What the analysis job worker runs for each upload
+        return GeminiCVAnalyzer().analyze_and_optimize(cv_text, job_role)[0]
+
+    def regenerate():
+        return GeminiCVAnalyzer(bypass_cache=True).analyze_and_optimize(cv_text, job_role)[0]
+
+    def job_matching():
+        return JobMatcher().find_matching_jobs({'ats_score': 70}, 'Remote')['search_suggestions']
+
+    def application_guide():
+        guide = JobMatcher().get_application_guide({'title': job_role, 'company': 'Acme', 'portal': 'linkedin'})
+        return {'degraded': guide['guide'] == DEGRADED_GUIDE}
+
+    return {'upload': upload, 'regenerate': regenerate, 'job_matching': job_matching,
+            'application_guide': application_guide}
+
+def bench_gemini_load(repeat=5, concurrency=(1, 8, 32), seed=42, job_role='Software Developer'):
+    """Drive the AI paths at increasing concurrency against the fake Gemini backend.
+
+    Latency and failures follow GEMINI_FAKE, so no quota is spent and the
+    retries, circuit breaker and local fallbacks run as they would in production.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from django.test.utils import override_settings
+    from .gemini_resilience import reset_breaker
+    from .gemini_service import reset_gemini_model
+
+    cv_text = '\n'.join(synthetic_cv_lines(600, random.Random(seed)))
+    results = []
+    # Every request sends the same prompt, so the cache, and coalescing of identical calls in flight,
+    # would answer nearly all of them without reaching the backend
+    with override_settings(GEMINI_BACKEND='fake', GEMINI_CACHE_ENABLED=False, GEMINI_COALESCE=False):
+        reset_gemini_model()
+        scenarios = _load_scenarios(cv_text, job_role)
+        for name, scenario in scenarios.items():
+            for workers in concurrency:
+                reset_breaker()
+                outcomes = []
+
+                def timed_call(_):
+                    start = time.perf_counter()
+                    try:
+                        result = scenario()
+                    except Exception:
+                        return time.perf_counter() - start, 'error'
+                    degraded = isinstance(result, dict) and result.get('degraded')
+                    return time.perf_counter() - start, 'degraded' if degraded else 'ok'
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    outcomes = list(executor.map(timed_call, range(workers * repeat)))
+                elapsed = time.perf_counter() - start
+                timings = [seconds for seconds, _ in outcomes]
+                results.append({
+                    'scenario': name,
+                    'concurrency': workers,
+                    'requests': len(outcomes),
+                    'p50_s': round(_percentile(timings, 50), 3),
+                    'p95_s': round(_percentile(timings, 95), 3),
+                    'per_s': round(len(outcomes) / elapsed, 1),
+                    'degraded': sum(1 for _, outcome in outcomes if outcome == 'degraded'),
+                    'errors': sum(1 for _, outcome in outcomes if outcome == 'error')
+                })
+    reset_gemini_model()
+    reset_breaker()
+    return results
+
+# Identity fields and the timing compared against a baseline, per suite
+BASELINE_KEYS = {
+    'analysis': (('stage', 'document'), 'p50_ms'),
+    'gemini_client': (('mode',), 'p50_us'),
+    'gemini_load': (('scenario', 'concurrency'), 'p95_s'),
+    'gemini_modes': (('mode',), 'p50_s'),
+    'keywords': (('keywords',), 'matcher_ms'),
+    'matrix': (('cvs',), 'matrix_s'),
+    'pdf_engines': (('engine', 'pages'), 'parallel_ms'),
+    'startup': (('import',), 'median_ms'),
+}
+
+def compare_to_baseline(suite, results, baseline, threshold):
+    """Pair rows with the baseline run and flag timings slower by more than threshold"""
+    key_fields, metric = BASELINE_KEYS[suite]
+    previous = {tuple(row.get(field) for field in key_fields): row for row in baseline}
+    comparison = []
+    for row in results:
+        key = tuple(row.get(field) for field in key_fields)
+        old = previous.get(key, {}).get(metric)
+        new = row.get(metric)
+        if not old or new is None:
+            continue
+        change = new / old - 1
+        comparison.append({
+            **dict(zip(key_fields, key)),
+            'baseline': old,
+            'current': new,
+            'change': round(change, 4),
+            'regression': change > threshold
+        })
+    return comparison
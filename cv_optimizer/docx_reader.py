@@ -0,0 +1,132 @@
+import re
+import shutil
+import subprocess
+import zipfile
+from lxml import etree
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+PARSED_TAGS = [W + name for name in ('p', 't', 'tab', 'br', 'cr', 'tr', 'tc', 'tbl')] + [MC_FALLBACK]
+BLOCK_TAGS = (W + 'p', W + 'tbl')
+
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP_MAGIC = b'PK\x03\x04'
+
+HEADER_RE = re.compile(r'^word/header\d*\.xml$')
+FOOTER_RE = re.compile(r'^word/footer\d*\.xml$')
+
+class LegacyDocError(Exception):
+    """Raised for Word 97-2003 .doc files that cannot be converted here"""
+
+def sniff_format(file_path):
+    """Identify a Word upload by its leading bytes rather than its extension"""
+    with open(file_path, 'rb') as file:
+        head = file.read(8)
+    if head.startswith(ZIP_MAGIC):
+        return 'docx'
+    if head == OLE_MAGIC:
+        return 'doc'
+    return None
+
+def iter_part_lines(archive, part_name):
+    """Yield paragraph and table-row text from one WordprocessingML part in order.
+
+    Paragraphs nested in text boxes are emitted as their own lines, table
+    rows become tab-separated lines, and VML fallback copies of text boxes
+    are skipped. Finished top-level blocks are dropped from the tree so
+    memory stays bounded by the largest block rather than the whole part.
+    """
+    paragraphs = []
+    cells = []
+    rows = []
+    fallback_depth = 0
+
+    with archive.open(part_name) as part:
+        for event, elem in etree.iterparse(part, events=('start', 'end'), tag=PARSED_TAGS):
+            tag = elem.tag
+            if event == 'start':
+                if tag == MC_FALLBACK:
+                    fallback_depth += 1
+                elif fallback_depth:
+                    pass
+                elif tag == W + 'p':
+                    paragraphs.append([])
+                elif tag == W + 'tr':
+                    rows.append([])
+                elif tag == W + 'tc':
+                    cells.append([])
+                continue
+
+            line = None
+            if tag == MC_FALLBACK:
+                fallback_depth -= 1
+            elif fallback_depth:
+                continue
+            elif tag == W + 't':
+                if paragraphs and elem.text:
+                    paragraphs[-1].append(elem.text)
+            elif tag == W + 'tab':
+                if paragraphs:
+                    paragraphs[-1].append('\t')
+            elif tag in (W + 'br', W + 'cr'):
+                if paragraphs:
+                    paragraphs[-1].append('\n')
+            elif tag == W + 'p':
+                line = ''.join(paragraphs.pop())
+            elif tag == W + 'tc':
+                rows[-1].append(' '.join(text for text in cells.pop() if text))
+            elif tag == W + 'tr':
+                line = '\t'.join(rows.pop())
+
+            if line is not None:
+                # Text inside a table cell belongs to that cell, not a line of its own
+                if cells:
+                    cells[-1].append(line)
+                else:
+                    yield line
+
+            if tag in BLOCK_TAGS and not (paragraphs or rows):
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+def iter_docx_lines(file_path):
+    """Yield the text lines of a DOCX: headers, body, then footers"""
+    with zipfile.ZipFile(file_path) as archive:
+        names = archive.namelist()
+        headers = sorted(name for name in names if HEADER_RE.match(name))
+        footers = sorted(name for name in names if FOOTER_RE.match(name))
+
+        seen = set()
+        for part_name in headers:
+            # First-page, default and even headers often repeat the same text
+            lines = [line for line in iter_part_lines(archive, part_name) if line.strip()]
+            key = tuple(lines)
+            if lines and key not in seen:
+                seen.add(key)
+                yield from lines
+
+        yield from iter_part_lines(archive, 'word/document.xml')
+
+        for part_name in footers:
+            lines = [line for line in iter_part_lines(archive, part_name) if line.strip()]
+            key = tuple(lines)
+            if lines and key not in seen:
+                seen.add(key)
+                yield from lines
+
+def convert_legacy_doc(file_path, timeout=20):
+    """Get the text of a .doc file through antiword when it is installed"""
+    antiword = shutil.which('antiword')
+    if not antiword:
+        raise LegacyDocError(
+            "legacy Word .doc files are not supported. Please save it as DOCX or PDF and upload again."
+        )
+    try:
+        result = subprocess.run(
+            [antiword, file_path], capture_output=True, timeout=timeout, check=True
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        raise LegacyDocError(f"could not convert .doc file: {str(e)}")
+    return result.stdout.decode('utf-8', errors='replace')
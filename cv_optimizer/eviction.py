@@ -0,0 +1,36 @@
+import threading
+
+# Stores evict once every this many new rows rather than counting rows on each one
+EVICT_EVERY = 50
+
+def evict_lru(queryset, last_used, max_rows, expired=None):
+    """Delete expired rows, then the least recently used ones beyond max_rows.
+
+    last_used is an expression giving when a row was last used, e.g.
+    F('last_used_at'), and expired a Q of rows to drop whatever their age.
+    Rows tied with the newest evicted one go too, so one DELETE trims the
+    table. Returns the (expired, evicted) counts.
+    """
+    expired_count = queryset.filter(expired).delete()[0] if expired is not None else 0
+    rows = queryset.annotate(lru_last_used=last_used)
+    cutoff = rows.order_by('-lru_last_used').values_list('lru_last_used', flat=True)[max_rows:max_rows + 1]
+    evicted = 0
+    if cutoff:
+        evicted, _ = rows.filter(lru_last_used__lte=cutoff[0]).delete()
+    return expired_count, evicted
+
+class EvictionTrigger:
+    """Run an eviction once every EVICT_EVERY rows a store adds in this process"""
+
+    def __init__(self, evict, every=EVICT_EVERY):
+        self.evict = evict
+        self.every = every
+        self._stores = 0
+        self._lock = threading.Lock()
+
+    def stored(self):
+        with self._lock:
+            self._stores += 1
+            due = self._stores % self.every == 0
+        if due:
+            self.evict()
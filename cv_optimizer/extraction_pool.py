@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+LIMIT_KINDS = ('timeout', 'memory', 'max_pages', 'crashed')
+POLL_INTERVAL = 0.05
+# Recycle workers now and then so slow leaks in the PDF libraries cannot build up
+MAX_TASKS_PER_WORKER = 200
+
+class ExtractionError(Exception):
+    """Raised when a sandboxed extraction fails, with kind naming the cause"""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+
+    def as_text(self):
+        """Render the error the way extract_text_from_file reports failures"""
+        if self.message.startswith('Error'):
+            return self.message
+        return f"Error extracting CV ({self.kind}): {self.message}"
+
+def _extract(file_path, max_pages, engine):
+    from .pdf_reader import get_engine, iter_pdf_pages
+    from .utils import extract_text_from_file, is_extraction_error
+
+    if os.path.splitext(file_path)[1].lower() == '.pdf':
+        try:
+            page_count = get_engine(engine).page_count(file_path)
+            # Sandbox workers are the parallelism here, so pages are read serially
+            text = '\n'.join(iter_pdf_pages(file_path, max_pages, engine))
+        except Exception as e:
+            raise ExtractionError('unreadable', f"Error reading PDF: {str(e)}")
+        return text, bool(max_pages) and page_count > max_pages
+
+    text = extract_text_from_file(file_path)
+    if is_extraction_error(text):
+        raise ExtractionError('unreadable', text)
+    return text, False
+
+def _worker_main(conn):
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        try:
+            text, truncated = _extract(*task)
+            conn.send(('ok', text, truncated))
+        except ExtractionError as e:
+            conn.send(('error', e.kind, e.message))
+        except MemoryError:
+            conn.send(('error', 'memory', 'ran out of memory'))
+        except Exception as e:
+            conn.send(('error', 'unreadable', f"Error extracting CV: {str(e)}"))
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def rss(self):
+        """Resident set size of the worker in bytes, or 0 where /proc is unavailable"""
+        try:
+            with open(f'/proc/{self.process.pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+class ExtractionPool:
+    """A few long-lived extraction subprocesses with per-file time, memory and page limits.
+
+    A worker that times out, grows past the RSS cap or dies is killed and
+    replaced, and the caller gets an ExtractionError instead of a hang.
+    """
+
+    def __init__(self, size=2, timeout=30, max_rss=512 * 1024 * 1024, max_pages=30, engine='auto'):
+        self.size = size
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.max_pages = max_pages
+        self.engine = engine
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        # Holds idle workers plus None for each slot with no process yet
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def _acquire(self):
+        worker = self._idle.get()
+        if worker is None:
+            try:
+                worker = _Worker(self._context)
+            except Exception:
+                self._idle.put(None)
+                raise
+            with self._lock:
+                self._workers.add(worker)
+        return worker
+
+    def _release(self, worker, healthy):
+        if healthy and worker.tasks < MAX_TASKS_PER_WORKER:
+            self._idle.put(worker)
+            return
+        with self._lock:
+            self._workers.discard(worker)
+        if healthy:
+            worker.stop()
+        else:
+            worker.kill()
+        self._idle.put(None)
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def extract(self, file_path):
+        """Extract the text of a file in a sandboxed worker, raising ExtractionError on failure"""
+        worker = self._acquire()
+        healthy = False
+        try:
+            worker.tasks += 1
+            try:
+                worker.conn.send((file_path, self.max_pages, self.engine))
+            except OSError:
+                # The worker died while idle (OOM-killed, crashed); it is replaced on release
+                self._count('crashed')
+                raise ExtractionError('crashed', f'extraction worker exited with code {worker.process.exitcode}')
+            deadline = time.monotonic() + self.timeout
+            while not worker.conn.poll(POLL_INTERVAL):
+                if not worker.process.is_alive():
+                    self._count('crashed')
+                    raise ExtractionError('crashed', f'extraction worker exited with code {worker.process.exitcode}')
+                if time.monotonic() > deadline:
+                    self._count('timeout')
+                    raise ExtractionError('timeout', f'extraction took longer than {self.timeout}s')
+                if self.max_rss and worker.rss() > self.max_rss:
+                    self._count('memory')
+                    raise ExtractionError('memory', f'extraction used more than {self.max_rss // (1024 * 1024)} MB')
+
+            try:
+                result = worker.conn.recv()
+            except (EOFError, OSError):
+                self._count('crashed')
+                raise ExtractionError('crashed', 'extraction worker exited without a result')
+            healthy = True
+        finally:
+            self._release(worker, healthy)
+
+        if result[0] == 'error':
+            _, kind, message = result
+            self._count(kind)
+            raise ExtractionError(kind, message)
+
+        _, text, truncated = result
+        self._count('completed')
+        if truncated:
+            self._count('max_pages')
+        return text
+
+    def stats(self):
+        """Return how many files completed, failed and hit each limit"""
+        with self._lock:
+            stats = {kind: self._stats[kind] for kind in ('completed', 'unreadable') + LIMIT_KINDS}
+            stats['workers'] = len(self._workers)
+        return stats
+
+    def close(self):
+        """Stop the idle workers; new ones are started on demand"""
+        slots = []
+        while True:
+            try:
+                slots.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in slots:
+            if worker is not None:
+                with self._lock:
+                    self._workers.discard(worker)
+                worker.stop()
+            self._idle.put(None)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_extraction_pool():
+    """Get the process-wide extraction pool, sized and limited from settings"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from django.conf import settings
+            _pool = ExtractionPool(
+                size=settings.CV_EXTRACTION_WORKERS,
+                timeout=settings.CV_EXTRACTION_TIMEOUT,
+                max_rss=settings.CV_EXTRACTION_MAX_RSS_MB * 1024 * 1024,
+                max_pages=settings.CV_PDF_MAX_PAGES,
+                engine=settings.CV_PDF_ENGINE
+            )
+        return _pool
+
+def extraction_stats():
+    """Return the limit counters of this process's pool, if it has started"""
+    return _pool.stats() if _pool is not None else None
+
+def extract_text_sandboxed(file_path):
+    """Extract text in the sandbox pool, falling back to in-process where subprocesses are not allowed"""
+    from django.conf import settings
+    from .utils import extract_text_from_file
+
+    # Pool workers (e.g. rescore_cvs) are daemonic and cannot start processes
+    if not settings.CV_EXTRACTION_SANDBOX or multiprocessing.current_process().daemon:
+        return extract_text_from_file(file_path)
+    try:
+        return get_extraction_pool().extract(file_path)
+    except ExtractionError as e:
+        return e.as_text()
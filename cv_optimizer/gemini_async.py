@@ -0,0 +1,163 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .gemini_resilience import GeminiUnavailableError, call_gemini_async
+from .gemini_schemas import (
+    ANALYSIS_CONFIG, COMBINED_CONFIG, JOBS_CONFIG, AnalysisResult, CombinedResult, JobSuggestions, SchemaError,
+    parse_reply
+)
+from .gemini_service import (
+    DEGRADED_GUIDE, FALLBACK_JOB_SUGGESTIONS, GeminiCVAnalyzer, get_gemini_model, reset_gemini_model
+)
+from .gemini_singleflight import flight_key, single_flight_async
+from .metrics import increment, observe, set_gauge, span
+
+_semaphore = None
+_semaphore_loop = None
+_in_flight = 0
+_model_loop = None
+
+def get_semaphore():
+    """Get the semaphore capping concurrent Gemini calls from this process's event loop"""
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    # asyncio primitives belong to one loop; an ASGI server runs a single loop per process
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+def get_loop_gemini_model():
+    """Get the shared Gemini model, replacing it when a new event loop starts using it"""
+    global _model_loop
+    loop = asyncio.get_running_loop()
+    # The model keeps its async client, which is bound to the loop it was first used on
+    if _model_loop is not None and _model_loop is not loop:
+        reset_gemini_model()
+    _model_loop = loop
+    return get_gemini_model()
+
+@asynccontextmanager
+async def _upstream_slot():
+    global _in_flight
+    async with get_semaphore():
+        _in_flight += 1
+        set_gauge('gemini_async_in_flight', _in_flight)
+        try:
+            yield
+        finally:
+            _in_flight -= 1
+            set_gauge('gemini_async_in_flight', _in_flight)
+
+class AsyncGeminiCVAnalyzer(GeminiCVAnalyzer):
+    """GeminiCVAnalyzer for async views: the same prompts, parsing and cache with awaited API calls"""
+
+    def _shared_model(self):
+        return get_loop_gemini_model()
+
+    async def _request(self, prompt, **kwargs):
+        # A slot per attempt, so backoff between retries does not hold one
+        async with _upstream_slot():
+            return await self.model.generate_content_async(prompt, **kwargs)
+
+    async def generate_text(self, method, prompt, generation_config=None, parse=None):
+        """Get the response text, or the validated parse result, without blocking the event loop"""
+        cache_prompt = self._cache_prompt(prompt, generation_config)
+        cached = await sync_to_async(self._cached_result)(method, cache_prompt, parse)
+        if cached is not None:
+            return cached
+
+        return await single_flight_async(
+            method, flight_key(self.model.model_name, method, cache_prompt),
+            lambda: self._fetch(method, prompt, generation_config, cache_prompt, parse),
+            recheck=self._flight_recheck(lambda: sync_to_async(self._cached_result)(method, cache_prompt, parse))
+        )
+
+    async def _fetch(self, method, prompt, generation_config, cache_prompt, parse):
+        # GEMINI_TIMEOUT bounds the whole call, including time queued for a slot and retries
+        response = await call_gemini_async(method, lambda: self._request(prompt, generation_config=generation_config))
+        self._record_usage(method, response)
+        text = response.text
+        result = parse_reply(parse, text, method) if parse else text
+        await sync_to_async(self._cache_store)(method, cache_prompt, text)
+        return result
+
+    async def stream_optimized_cv(self, cv_text, analysis_data):
+        """Yield the optimized CV in chunks as Gemini generates it"""
+        method = 'generate_optimized_cv'
+        prompt = self.optimized_cv_prompt(cv_text, analysis_data)
+        cached = await sync_to_async(self._cache_lookup)(method, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        # The slot is held for the whole stream; retries and GEMINI_TIMEOUT cover getting it started
+        async with _upstream_slot():
+            with span('gemini_stream_optimized_cv', metric='gemini_call_seconds'):
+                start = time.perf_counter()
+                response = await call_gemini_async(method, lambda: self.model.generate_content_async(prompt, stream=True))
+                async for chunk in response:
+                    if not chunks:
+                        observe('gemini_time_to_first_token_seconds', time.perf_counter() - start, stage=method)
+                    chunks.append(chunk.text)
+                    yield chunk.text
+        self._record_usage(method, response)
+        await sync_to_async(self._cache_store)(method, prompt, ''.join(chunks))
+
+    async def analyze_cv(self, cv_text, job_description=""):
+        with span('gemini_analyze_cv', metric='gemini_call_seconds'):
+            try:
+                result = await self.generate_text(
+                    'analyze_cv', self.analysis_prompt(cv_text, job_description), ANALYSIS_CONFIG, parse=AnalysisResult
+                )
+                return result.as_dict()
+            except (GeminiUnavailableError, SchemaError):
+                return await sync_to_async(self.degraded_analysis)(cv_text, job_description)
+
+    async def generate_optimized_cv(self, cv_text, analysis_data):
+        with span('gemini_generate_optimized_cv', metric='gemini_call_seconds'):
+            try:
+                return await self.generate_text('generate_optimized_cv', self.optimized_cv_prompt(cv_text, analysis_data))
+            except GeminiUnavailableError:
+                return ''
+
+    async def analyze_and_optimize(self, cv_text, job_description=""):
+        with span('gemini_analyze_and_optimize', metric='gemini_call_seconds'):
+            if getattr(settings, 'GEMINI_COMBINED_ANALYSIS', True):
+                try:
+                    result = await self.generate_text(
+                        'analyze_and_optimize', self.combined_prompt(cv_text, job_description), COMBINED_CONFIG,
+                        parse=CombinedResult
+                    )
+                    return result.analysis.as_dict(), result.optimized_cv
+                except GeminiUnavailableError:
+                    return await sync_to_async(self.degraded_analysis)(cv_text, job_description), ''
+                except SchemaError:
+                    pass
+
+            analysis = await self.analyze_cv(cv_text, job_description)
+            if analysis.get('degraded'):
+                return analysis, ''
+            return analysis, await self.generate_optimized_cv(cv_text, analysis)
+
+    async def find_matching_jobs(self, cv_analysis, location=""):
+        with span('gemini_find_matching_jobs', metric='gemini_call_seconds'):
+            try:
+                result = await self.generate_text(
+                    'find_matching_jobs', self.matching_jobs_prompt(cv_analysis, location), JOBS_CONFIG, parse=JobSuggestions
+                )
+                return result.as_dict()
+            except (GeminiUnavailableError, SchemaError):
+                increment('gemini_degraded_total', method='find_matching_jobs')
+                return dict(FALLBACK_JOB_SUGGESTIONS, degraded=True)
+
+    async def get_application_guide(self, job_title, company_name=""):
+        with span('gemini_get_application_guide', metric='gemini_call_seconds'):
+            try:
+                return await self.generate_text('get_application_guide', self.application_guide_prompt(job_title, company_name))
+            except GeminiUnavailableError:
+                increment('gemini_degraded_total', method='get_application_guide')
+                return DEGRADED_GUIDE
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .eviction import EvictionTrigger, evict_lru
+from .metrics import increment
+from .models import GeminiResponse
+
+# Seconds a cached response stays valid, per GeminiCVAnalyzer method
+DEFAULT_TTLS = {
+    'analyze_cv': 7 * 24 * 3600,
+    'generate_optimized_cv': 7 * 24 * 3600,
+    'analyze_and_optimize': 7 * 24 * 3600,
+    'find_matching_jobs': 24 * 3600,
+    'get_application_guide': 3 * 24 * 3600,
+    'custom_job_search': 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+def prompt_key(model_name, prompt):
+    """Hash a model name and prompt into a cache key"""
+    return hashlib.sha256(f'{model_name}\n{prompt}'.encode('utf-8')).hexdigest()
+
+def cache_enabled():
+    return getattr(settings, 'GEMINI_CACHE_ENABLED', True)
+
+def method_ttl(method):
+    ttls = {**DEFAULT_TTLS, **getattr(settings, 'GEMINI_CACHE_TTLS', {})}
+    return ttls.get(method, DEFAULT_TTL)
+
+def get_cached_response(model_name, method, prompt):
+    """Return the cached response text for a prompt, or None on a miss"""
+    now = timezone.now()
+    cached = GeminiResponse.objects.filter(cache_key=prompt_key(model_name, prompt), expires_at__gt=now)
+    text = cached.values_list('response_text', flat=True).first()
+    if text is None:
+        increment('gemini_cache_requests_total', method=method, outcome='miss')
+        return None
+    cached.update(hit_count=F('hit_count') + 1, last_used_at=now)
+    increment('gemini_cache_requests_total', method=method, outcome='hit')
+    return text
+
+def store_response(model_name, method, prompt, text):
+    """Cache a response for the method's TTL, evicting least recently used rows past the size cap"""
+    if not text or method_ttl(method) <= 0:
+        return
+    now = timezone.now()
+    GeminiResponse.objects.update_or_create(
+        cache_key=prompt_key(model_name, prompt),
+        defaults={
+            'model_name': model_name,
+            'method': method,
+            'response_text': text,
+            'expires_at': now + timedelta(seconds=method_ttl(method)),
+            'last_used_at': now
+        }
+    )
+    _eviction.stored()
+
+def evict_responses(max_entries=None):
+    """Delete expired responses and the least recently used ones beyond max_entries"""
+    if max_entries is None:
+        max_entries = getattr(settings, 'GEMINI_CACHE_MAX_ENTRIES', 5000)
+    expired, evicted = evict_lru(
+        GeminiResponse.objects.all(), F('last_used_at'), max_entries, expired=Q(expires_at__lte=timezone.now())
+    )
+    if evicted:
+        increment('gemini_cache_evictions_total', evicted)
+    return expired, evicted
+
+_eviction = EvictionTrigger(evict_responses)
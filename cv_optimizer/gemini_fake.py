@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from google.api_core import exceptions as api_exceptions
+from .prompt_builder import estimate_tokens
+
+# Overridden per key by settings.GEMINI_FAKE
+FAKE_DEFAULTS = {
+    # 'fixed', 'uniform' (latency_median +/- half) or 'lognormal' (long tail up to around latency_p95)
+    'latency': 'lognormal',
+    'latency_median': 1.2,
+    'latency_p95': 4.0,
+    # Share of calls failing with a retryable API error, split between 503s and 429s
+    'error_rate': 0.0,
+    # Share of JSON replies wrapped in a markdown fence, as Gemini sometimes does outside JSON mode
+    'fenced_rate': 0.0,
+    'first_chunk_seconds': 0.4,
+    'chunk_seconds': 0.05,
+    'chunk_chars': 80,
+    # Multiplies every delay, e.g. 0.1 for quick CI runs with the same shape
+    'time_scale': 1.0,
+    'seed': 0,
+}
+
+Z_95 = 1.645
+CV_RE = re.compile(r'(?:CV Content|Original CV): (.*?)\n\s*(?:Job Description|Analysis):', re.DOTALL)
+TITLE_RE = re.compile(r'Job Title: (.*)')
+KEYWORDS = ['Python', 'SQL', 'Django', 'REST APIs', 'AWS', 'Docker', 'Git', 'Agile', 'Leadership', 'Communication']
+SECTIONS = ['Skills', 'Certifications', 'Projects', 'Professional Summary', 'Achievements']
+JOB_TITLES = ['Software Engineer', 'Backend Developer', 'Data Analyst', 'Full Stack Developer', 'DevOps Engineer']
+
+class FakeUsage:
+    def __init__(self, prompt, text):
+        self.prompt_token_count = estimate_tokens(prompt)
+        self.candidates_token_count = estimate_tokens(text)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeResponse:
+    def __init__(self, prompt, text):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt, text)
+
+class FakeStream:
+    """A streamed response: chunks arrive chunk_seconds apart"""
+
+    def __init__(self, prompt, text, chunk_chars, delay):
+        self.chunks = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+        self.delay = delay
+        self.usage_metadata = FakeUsage(prompt, text)
+
+    def __iter__(self):
+        for position, chunk in enumerate(self.chunks):
+            if position:
+                time.sleep(self.delay)
+            yield FakeChunk(chunk)
+
+    async def __aiter__(self):
+        for position, chunk in enumerate(self.chunks):
+            if position:
+                await asyncio.sleep(self.delay)
+            yield FakeChunk(chunk)
+
+class FakeTokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+def _prompt_rng(prompt):
+    # Same prompt, same answer, like a cached model at temperature 0
+    return random.Random(hashlib.sha256(prompt.encode()).digest())
+
+def fake_analysis(rng):
+    """An analysis matching the shape the analyze_cv prompt asks for"""
+    return {
+        'ats_score': rng.randint(45, 92),
+        'missing_sections': rng.sample(SECTIONS, rng.randint(0, 2)),
+        'improvements': [
+            'Add quantified achievements to each role',
+            'Move the strongest skills into the professional summary',
+            'Use standard section headings'
+        ][:rng.randint(1, 3)],
+        'keyword_suggestions': rng.sample(KEYWORDS, 4),
+        'optimized_sections': {
+            'summary': 'Results-driven engineer with a record of shipping reliable software.',
+            'experience': 'Led delivery of features used by thousands of customers.',
+            'skills': ', '.join(rng.sample(KEYWORDS, 5))
+        },
+        'job_match_percentage': rng.randint(40, 90)
+    }
+
+def fake_cv(prompt, rng):
+    """Plain-text CV built from the lines of the CV embedded in the prompt"""
+    match = CV_RE.search(prompt)
+    lines = [line.strip() for line in (match.group(1) if match else '').splitlines() if line.strip()]
+    body = '\n'.join(f'- {line}' for line in lines[1:40]) or '- Delivered projects on time and within scope'
+    return (
+        f"{lines[0] if lines else 'Candidate Name'}\n\n"
+        "PROFESSIONAL SUMMARY\n"
+        "Engineer focused on measurable impact, clean code and dependable delivery.\n\n"
+        f"EXPERIENCE\n{body}\n\n"
+        f"SKILLS\n{', '.join(rng.sample(KEYWORDS, 6))}\n"
+    )
+
+def fake_reply(prompt, generation_config=None):
+    """Answer a GeminiCVAnalyzer prompt deterministically, in the format it asks for"""
+    rng = _prompt_rng(prompt)
+    schema = (generation_config or {}).get('response_schema') or {}
+    if 'optimized_cv' in schema.get('properties', {}):
+        return json.dumps(dict(fake_analysis(rng), optimized_cv=fake_cv(prompt, rng)))
+    if 'Analyze this CV' in prompt:
+        return json.dumps(fake_analysis(rng))
+    if 'Create an ATS-optimized CV' in prompt:
+        return fake_cv(prompt, rng)
+    if 'suggest job search terms' in prompt:
+        return json.dumps({
+            'job_titles': rng.sample(JOB_TITLES, 2),
+            'search_keywords': [keyword.lower() for keyword in rng.sample(KEYWORDS, 3)],
+            'job_portals': ['LinkedIn', 'Indeed', 'Naukri'],
+            'application_tips': ['Customize resume for each job', 'Write a targeted cover letter']
+        })
+    if 'job application guide' in prompt:
+        title = TITLE_RE.search(prompt)
+        return (
+            f"Application guide for {title.group(1).strip() if title else 'this role'}\n\n"
+            "1. Application strategy: tailor your CV to the job description.\n"
+            "2. Interview preparation: practise explaining two recent projects end to end.\n"
+            "3. Common questions: strengths, a hard bug you fixed, why this company.\n"
+            f"4. Skills to highlight: {', '.join(rng.sample(KEYWORDS, 3))}.\n"
+            "5. Resources: the company engineering blog and recent product announcements.\n"
+        )
+    if 'smart job search' in prompt:
+        return json.dumps({
+            'keywords': [keyword.lower() for keyword in rng.sample(KEYWORDS, 3)],
+            'alternative_titles': rng.sample(JOB_TITLES, 2),
+            'skills': rng.sample(KEYWORDS, 4),
+            'salary_range': f'${rng.randint(6, 9)}0,000 - ${rng.randint(10, 14)}0,000',
+            'companies': ['Google', 'Microsoft', 'Amazon']
+        })
+    return 'OK'
+
+class FakeGeminiModel:
+    """Local stand-in for genai.GenerativeModel with the same call surface.
+
+    Replies are deterministic per prompt; latency, failures and stream
+    timing are drawn from a seeded generator so runs are repeatable.
+    """
+
+    model_name = 'fake/gemini'
+
+    def __init__(self, **options):
+        self.options = dict(FAKE_DEFAULTS, **options)
+        self._rng = random.Random(self.options['seed'])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        from django.conf import settings
+        return cls(**getattr(settings, 'GEMINI_FAKE', {}))
+
+    def _draw(self):
+        """Pick the latency and outcome of one call"""
+        options = self.options
+        median = options['latency_median']
+        with self._lock:
+            if options['latency'] == 'lognormal':
+                sigma = math.log(max(options['latency_p95'], median) / median) / Z_95 if median > 0 else 0
+                latency = self._rng.lognormvariate(math.log(median), sigma) if median > 0 else 0
+            elif options['latency'] == 'uniform':
+                latency = self._rng.uniform(median / 2, median * 1.5)
+            else:
+                latency = median
+            failure = self._rng.random() < options['error_rate']
+            rate_limited = self._rng.random() < 0.5
+        error = None
+        if failure:
+            error = api_exceptions.ResourceExhausted('Fake quota exceeded') if rate_limited \
+                else api_exceptions.ServiceUnavailable('Fake backend unavailable')
+        return latency * options['time_scale'], error
+
+    def _plan(self, request_options, stream):
+        latency, error = self._draw()
+        if stream:
+            latency = min(latency, self.options['first_chunk_seconds'] * self.options['time_scale'])
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and latency > timeout:
+            return timeout, api_exceptions.DeadlineExceeded('Fake backend timed out')
+        return latency, error
+
+    def _respond(self, prompt, generation_config, stream):
+        text = fake_reply(prompt, generation_config)
+        with self._lock:
+            fenced = self._rng.random() < self.options['fenced_rate']
+        if fenced and text.startswith('{'):
+            text = f'```json\n{text}\n```'
+        if stream:
+            options = self.options
+            return FakeStream(prompt, text, options['chunk_chars'], options['chunk_seconds'] * options['time_scale'])
+        return FakeResponse(prompt, text)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        delay, error = self._plan(request_options, stream)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self._respond(prompt, generation_config, stream)
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, request_options=None):
+        delay, error = self._plan(request_options, stream)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self._respond(prompt, generation_config, stream)
+
+    def count_tokens(self, text, **kwargs):
+        return FakeTokenCount(estimate_tokens(text))
@@ -0,0 +1,190 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from google.api_core import exceptions as api_exceptions
+from .metrics import increment, set_gauge
+
+# Rate limits, overload and timeouts are worth another try; bad requests and keys are not
+RETRYABLE_ERRORS = (
+    api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests, api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError, api_exceptions.BadGateway, api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded, asyncio.TimeoutError, TimeoutError, ConnectionError
+)
+TIMEOUT_ERRORS = (api_exceptions.DeadlineExceeded, api_exceptions.GatewayTimeout, asyncio.TimeoutError, TimeoutError)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+# The breaker judges the last WINDOW calls, once there are at least MIN_CALLS of them
+WINDOW = 20
+MIN_CALLS = 5
+STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+class GeminiUnavailableError(Exception):
+    """Raised when Gemini cannot answer: the circuit is open, or retries or the deadline ran out"""
+
+class CircuitBreaker:
+    """Stops calling Gemini while too many recent calls failed or ran slow.
+
+    Once open it rejects calls for open_seconds, then lets a single trial
+    call through: success closes it again, failure reopens it.
+    """
+
+    def __init__(self, error_rate=0.5, slow_seconds=20, open_seconds=30, window=WINDOW, min_calls=MIN_CALLS):
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.min_calls = min_calls
+        self._results = deque(maxlen=window)
+        self._state = 'closed'
+        self._opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == 'open' and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state('half_open')
+        return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        self._trial_running = False
+        self._results.clear()
+        if state == 'open':
+            self._opened_at = time.monotonic()
+            increment('gemini_circuit_opened_total')
+        set_gauge('gemini_circuit_state', STATE_VALUES[state])
+
+    def allow(self):
+        """Whether a call may go out now"""
+        with self._lock:
+            state = self._current_state()
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return state == 'closed'
+
+    def record(self, ok, seconds):
+        """Count the outcome of an allowed call, tripping or resetting the breaker.
+
+        ok=None is for calls that ended without a verdict on Gemini (a bug on
+        our side, a cancelled request); it only frees the trial slot.
+        """
+        failed = not ok or seconds > self.slow_seconds
+        with self._lock:
+            if ok is None:
+                self._trial_running = False
+            elif self._state == 'half_open':
+                self._set_state('open' if failed else 'closed')
+            elif self._state == 'closed':
+                self._results.append(failed)
+                if len(self._results) >= self.min_calls and sum(self._results) / len(self._results) >= self.error_rate:
+                    self._set_state('open')
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+def get_breaker():
+    """Get the process-wide Gemini circuit breaker, configured from settings"""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                error_rate=settings.GEMINI_BREAKER_ERROR_RATE,
+                slow_seconds=settings.GEMINI_BREAKER_SLOW_SECONDS,
+                open_seconds=settings.GEMINI_BREAKER_OPEN_SECONDS
+            )
+        return _breaker
+
+def reset_breaker():
+    """Forget the breaker's state so the next call starts closed (e.g. in tests)"""
+    global _breaker
+    with _breaker_lock:
+        _breaker = None
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter, so retrying callers spread out"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _is_api_error(error):
+    return isinstance(error, (api_exceptions.GoogleAPIError,) + RETRYABLE_ERRORS)
+
+def _next_delay(method, attempt, error, deadline):
+    """Seconds to wait before the next attempt, or None to give up"""
+    if isinstance(error, TIMEOUT_ERRORS):
+        increment('gemini_timeouts_total', method=method)
+    if attempt >= settings.GEMINI_RETRIES or not isinstance(error, RETRYABLE_ERRORS):
+        return None
+    delay = backoff_delay(attempt)
+    if time.monotonic() + delay >= deadline:
+        return None
+    increment('gemini_retries_total', method=method)
+    return delay
+
+def _unavailable(method, reason, error=None):
+    increment('gemini_unavailable_total', method=method, reason=reason)
+    message = f'Gemini {method} unavailable: {reason}'
+    return GeminiUnavailableError(f'{message} ({error})' if error else message)
+
+def call_gemini(method, call):
+    """Run call(timeout) with retries and the circuit breaker, all within GEMINI_TIMEOUT seconds"""
+    breaker = get_breaker()
+    deadline = time.monotonic() + settings.GEMINI_TIMEOUT
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise _unavailable(method, 'circuit_open')
+        start = time.monotonic()
+        ok = None
+        try:
+            result = call(max(deadline - start, 0.1))
+            ok = True
+        except Exception as e:
+            # Anything but an API failure is a bug on our side and surfaces as itself
+            if not _is_api_error(e):
+                raise
+            ok = False
+            error = e
+        finally:
+            breaker.record(ok, time.monotonic() - start)
+        if ok:
+            return result
+        delay = _next_delay(method, attempt, error, deadline)
+        if delay is None:
+            raise _unavailable(method, 'failed', error) from error
+        time.sleep(delay)
+        attempt += 1
+
+async def call_gemini_async(method, call):
+    """Await call() with retries and the circuit breaker, all within GEMINI_TIMEOUT seconds"""
+    breaker = get_breaker()
+    deadline = time.monotonic() + settings.GEMINI_TIMEOUT
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise _unavailable(method, 'circuit_open')
+        start = time.monotonic()
+        ok = None
+        try:
+            result = await asyncio.wait_for(call(), timeout=max(deadline - start, 0.1))
+            ok = True
+        except Exception as e:
+            if not _is_api_error(e):
+                raise
+            ok = False
+            error = e
+        finally:
+            breaker.record(ok, time.monotonic() - start)
+        if ok:
+            return result
+        delay = _next_delay(method, attempt, error, deadline)
+        if delay is None:
+            raise _unavailable(method, 'failed', error) from error
+        await asyncio.sleep(delay)
+        attempt += 1
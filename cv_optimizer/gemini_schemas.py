@@ -0,0 +1,239 @@
+import json
+import re
+from .metrics import increment
+
+STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+
+ANALYSIS_PROPERTIES = {
+    'ats_score': {'type': 'number'},
+    'missing_sections': STRING_LIST,
+    'improvements': STRING_LIST,
+    'keyword_suggestions': STRING_LIST,
+    'optimized_sections': {
+        'type': 'object',
+        'properties': {
+            'summary': {'type': 'string'},
+            'experience': {'type': 'string'},
+            'skills': {'type': 'string'}
+        }
+    },
+    'job_match_percentage': {'type': 'number'}
+}
+ANALYSIS_REQUIRED = ['ats_score', 'missing_sections', 'improvements', 'keyword_suggestions', 'job_match_percentage']
+
+ANALYSIS_SCHEMA = {'type': 'object', 'properties': ANALYSIS_PROPERTIES, 'required': ANALYSIS_REQUIRED}
+
+# analyze_and_optimize: the analyze_cv fields plus the CV itself
+COMBINED_SCHEMA = {
+    'type': 'object',
+    'properties': dict(ANALYSIS_PROPERTIES, optimized_cv={'type': 'string'}),
+    'required': ANALYSIS_REQUIRED + ['optimized_cv']
+}
+
+JOBS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'job_titles': STRING_LIST,
+        'search_keywords': STRING_LIST,
+        'job_portals': STRING_LIST,
+        'application_tips': STRING_LIST
+    },
+    'required': ['job_titles', 'search_keywords']
+}
+
+SEARCH_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'keywords': STRING_LIST,
+        'alternative_titles': STRING_LIST,
+        'skills': STRING_LIST,
+        'salary_range': {'type': 'string'},
+        'companies': STRING_LIST
+    },
+    'required': ['keywords', 'alternative_titles']
+}
+
+def json_config(schema):
+    """Generation config asking Gemini for JSON matching a schema"""
+    return {'response_mime_type': 'application/json', 'response_schema': schema}
+
+ANALYSIS_CONFIG = json_config(ANALYSIS_SCHEMA)
+COMBINED_CONFIG = json_config(COMBINED_SCHEMA)
+JOBS_CONFIG = json_config(JOBS_SCHEMA)
+SEARCH_CONFIG = json_config(SEARCH_SCHEMA)
+
+NUMBER_RE = re.compile(r'-?\d+(\.\d+)?')
+
+class SchemaError(ValueError):
+    """Raised when a model reply does not hold a usable result"""
+
+def extract_json(text):
+    """Find the JSON object in a model reply, returning (data, repaired) or (None, False).
+
+    Tolerates markdown fences and prose around the object, and a reply cut
+    off mid-object, which is closed after its last complete value.
+    """
+    if not text:
+        return None, False
+    start = text.find('{')
+    if start < 0:
+        return None, False
+    stripped = text.strip()
+    clean = stripped.startswith('{') and stripped.endswith('}')
+
+    closers = []
+    in_string = escaped = False
+    last_complete = None
+    for position in range(start, len(text)):
+        char = text[position]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            closers.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if not closers or closers.pop() != char:
+                break
+            if not closers:
+                try:
+                    return json.loads(text[start:position + 1]), not clean
+                except ValueError:
+                    break
+            last_complete = (position + 1, list(closers))
+        elif char == ',':
+            last_complete = (position, list(closers))
+
+    if last_complete is None:
+        return None, False
+    end, open_closers = last_complete
+    try:
+        data = json.loads(text[start:end] + ''.join(reversed(open_closers)))
+    except ValueError:
+        return None, False
+    return data, True
+
+def _number(data, field):
+    value = data.get(field)
+    if isinstance(value, str):
+        match = NUMBER_RE.search(value)
+        value = float(match.group()) if match else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise SchemaError(f'{field} is not a number')
+    return max(0, min(100, value))
+
+def _strings(data, field, required=True):
+    value = data.get(field)
+    if value is None and not required:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        raise SchemaError(f'{field} is not a list')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+class AnalysisResult:
+    """A validated analyze_cv reply"""
+
+    def __init__(self, ats_score, missing_sections, improvements, keyword_suggestions, job_match_percentage,
+                 optimized_sections=None):
+        self.ats_score = ats_score
+        self.missing_sections = missing_sections
+        self.improvements = improvements
+        self.keyword_suggestions = keyword_suggestions
+        self.job_match_percentage = job_match_percentage
+        self.optimized_sections = optimized_sections or {}
+
+    @classmethod
+    def from_data(cls, data):
+        if not isinstance(data, dict):
+            raise SchemaError('analysis is not an object')
+        sections = data.get('optimized_sections')
+        return cls(
+            ats_score=_number(data, 'ats_score'),
+            missing_sections=_strings(data, 'missing_sections'),
+            improvements=_strings(data, 'improvements'),
+            keyword_suggestions=_strings(data, 'keyword_suggestions'),
+            job_match_percentage=_number(data, 'job_match_percentage'),
+            optimized_sections={key: str(value) for key, value in sections.items()} if isinstance(sections, dict) else {}
+        )
+
+    def as_dict(self):
+        return {
+            'ats_score': self.ats_score,
+            'missing_sections': self.missing_sections,
+            'improvements': self.improvements,
+            'keyword_suggestions': self.keyword_suggestions,
+            'optimized_sections': self.optimized_sections,
+            'job_match_percentage': self.job_match_percentage
+        }
+
+class CombinedResult:
+    """A validated analyze_and_optimize reply"""
+
+    def __init__(self, analysis, optimized_cv):
+        self.analysis = analysis
+        self.optimized_cv = optimized_cv
+
+    @classmethod
+    def from_data(cls, data):
+        analysis = AnalysisResult.from_data(data)
+        optimized_cv = data.get('optimized_cv')
+        if not isinstance(optimized_cv, str) or not optimized_cv.strip():
+            raise SchemaError('optimized_cv is missing')
+        return cls(analysis, optimized_cv)
+
+class JobSuggestions:
+    """A validated find_matching_jobs reply"""
+
+    def __init__(self, job_titles, search_keywords, job_portals, application_tips):
+        self.job_titles = job_titles
+        self.search_keywords = search_keywords
+        self.job_portals = job_portals
+        self.application_tips = application_tips
+
+    @classmethod
+    def from_data(cls, data):
+        if not isinstance(data, dict):
+            raise SchemaError('job suggestions are not an object')
+        job_titles = _strings(data, 'job_titles')
+        if not job_titles:
+            raise SchemaError('job_titles is empty')
+        return cls(
+            job_titles=job_titles,
+            search_keywords=_strings(data, 'search_keywords'),
+            job_portals=_strings(data, 'job_portals', required=False),
+            application_tips=_strings(data, 'application_tips', required=False)
+        )
+
+    def as_dict(self):
+        return {
+            'job_titles': self.job_titles,
+            'search_keywords': self.search_keywords,
+            'job_portals': self.job_portals,
+            'application_tips': self.application_tips
+        }
+
+def parse_reply(result_type, text, method=None):
+    """Extract and validate a reply, raising SchemaError when it is unusable.
+
+    With a method, the outcome is counted: clean JSON, JSON that needed
+    repair, or invalid (the caller falls back).
+    """
+    data, repaired = extract_json(text)
+    try:
+        if data is None:
+            raise SchemaError('no JSON object in the reply')
+        result = result_type.from_data(data)
+    except SchemaError:
+        if method:
+            increment('gemini_replies_total', method=method, outcome='invalid')
+        raise
+    if method:
+        increment('gemini_replies_total', method=method, outcome='repaired' if repaired else 'clean')
+    return result
@@ -1,18 +1,298 @@
 import google.generativeai as genai
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .gemini_resilience import GeminiUnavailableError, call_gemini
+from .gemini_schemas import (
+    ANALYSIS_CONFIG, COMBINED_CONFIG, JOBS_CONFIG, AnalysisResult, CombinedResult, JobSuggestions, SchemaError,
+    parse_reply
+)
+from .gemini_singleflight import flight_key, single_flight
+from .metrics import increment, observe, span
+from .prompt_builder import PromptBuilder, compact_json, estimate_tokens
 import json
-import re
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Seconds allowed for the diagnostic count_tokens call made when GEMINI_COUNT_TOKENS is on
+COUNT_TOKENS_TIMEOUT = 5
+
+# Served while Gemini is unavailable or its reply is unusable
+FALLBACK_JOB_SUGGESTIONS = {
+    "job_titles": ["Software Developer"],
+    "search_keywords": ["programming"],
+    "job_portals": ["LinkedIn", "Indeed"],
+    "application_tips": ["Tailor your resume"]
+}
+
+DEGRADED_GUIDE = (
+    "The AI application guide is unavailable right now. Use the checklist and portal tips "
+    "below, and try again in a few minutes for a guide tailored to this job."
+)
+
+def google_model():
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai.GenerativeModel(GeminiCVAnalyzer.model_name)
+
+def fake_model():
+    from .gemini_fake import FakeGeminiModel
+    return FakeGeminiModel.from_settings()
+
+# Selected with GEMINI_BACKEND; 'fake' answers locally for load tests and offline runs
+GEMINI_BACKENDS = {
+    'google': google_model,
+    'fake': fake_model,
+}
+
+_model = None
+_model_pid = None
+_model_lock = threading.Lock()
+
+def get_gemini_model():
+    """Get the process-wide Gemini model from GEMINI_BACKEND, building it on first use.
+
+    genai.configure() drops the library's cached API clients, so configuring
+    once and sharing the model keeps one warm connection across requests.
+    """
+    global _model, _model_pid
+    # A forked child must not reuse the parent's channel
+    if _model is None or _model_pid != os.getpid():
+        with _model_lock:
+            if _model is None or _model_pid != os.getpid():
+                backend = settings.GEMINI_BACKEND
+                if backend not in GEMINI_BACKENDS:
+                    raise ImproperlyConfigured(f'Unknown GEMINI_BACKEND "{backend}"')
+                _model = GEMINI_BACKENDS[backend]()
+                _model_pid = os.getpid()
+    return _model
+
+def reset_gemini_model():
+    """Forget the shared model so the next analyzer configures a new one (e.g. in tests)"""
+    global _model, _model_pid
+    with _model_lock:
+        _model = None
+        _model_pid = None
 
 class GeminiCVAnalyzer:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+    model_name = 'models/gemini-2.5-flash'
+    
+    def __init__(self, bypass_cache=False):
+        self.model = self._shared_model()
+        # Regeneration skips cached responses but still refreshes the cache
+        self.bypass_cache = bypass_cache
+        # Calls and tokens spent by this instance, from the API's usage metadata
+        self.usage = Counter()
+        self.prompt_builder = self._prompt_builder()
+    
+    def _shared_model(self):
+        return get_gemini_model()
+    
+    def _prompt_builder(self):
+        return PromptBuilder(settings.GEMINI_SECTION_TOKEN_BUDGET)
+    
+    def generate_text(self, method, prompt, generation_config=None, parse=None):
+        """Get the response text for a prompt, going through the response cache.
+        
+        With a parse result type, the reply is validated into it instead, and
+        replies that fail validation raise SchemaError and are not cached.
+        Identical calls already in flight share that request.
+        """
+        cache_prompt = self._cache_prompt(prompt, generation_config)
+        cached = self._cached_result(method, cache_prompt, parse)
+        if cached is not None:
+            return cached
+        
+        return single_flight(
+            method, flight_key(self.model.model_name, method, cache_prompt),
+            lambda: self._fetch(method, prompt, generation_config, cache_prompt, parse),
+            recheck=self._flight_recheck(lambda: self._cached_result(method, cache_prompt, parse))
+        )
+    
+    def _fetch(self, method, prompt, generation_config, cache_prompt, parse):
+        if settings.GEMINI_COUNT_TOKENS:
+            self._log_token_count(method, prompt)
+        response = call_gemini(method, lambda timeout: self.model.generate_content(
+            prompt, generation_config=generation_config, request_options={'timeout': timeout}
+        ))
+        self._record_usage(method, response)
+        text = response.text
+        result = parse_reply(parse, text, method) if parse else text
+        self._cache_store(method, cache_prompt, text)
+        return result
+    
+    def _log_token_count(self, method, prompt):
+        # Diagnostics only, after the cache missed: prompts are always sized with the local estimate
+        try:
+            counted = self.model.count_tokens(prompt, request_options={'timeout': COUNT_TOKENS_TIMEOUT}).total_tokens
+        except Exception as e:
+            logger.debug('Gemini %s: counting prompt tokens failed: %s', method, e)
+            return
+        logger.info('Gemini %s: prompt counted at %d tokens, estimated at %d', method, counted, estimate_tokens(prompt))
+    
+    def _cached_result(self, method, cache_prompt, parse):
+        cached = self._cache_lookup(method, cache_prompt)
+        if cached is None or not parse:
+            return cached
+        try:
+            return parse_reply(parse, cached)
+        except SchemaError:
+            # Cached before replies were validated; ask again
+            return None
+    
+    def _flight_recheck(self, recheck):
+        # Waiting on another process only pays off when its reply lands in a cache we read
+        from .gemini_cache import cache_enabled
+        
+        return recheck if cache_enabled() and not self.bypass_cache else None
+    
+    def stream_optimized_cv(self, cv_text, analysis_data):
+        """Yield the optimized CV in chunks as Gemini generates it"""
+        method = 'generate_optimized_cv'
+        prompt = self.optimized_cv_prompt(cv_text, analysis_data)
+        cached = self._cache_lookup(method, prompt)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        with span('gemini_stream_optimized_cv', metric='gemini_call_seconds'):
+            start = time.perf_counter()
+            # Retries cover starting the stream; a stream that breaks midway is not replayed
+            response = call_gemini(method, lambda timeout: self.model.generate_content(
+                prompt, stream=True, request_options={'timeout': timeout}
+            ))
+            for chunk in response:
+                if not chunks:
+                    observe('gemini_time_to_first_token_seconds', time.perf_counter() - start, stage=method)
+                chunks.append(chunk.text)
+                yield chunk.text
+        self._record_usage(method, response)
+        self._cache_store(method, prompt, ''.join(chunks))
+    
+    # Cached per backend model, so fake replies never answer for the real model
+    def _cache_lookup(self, method, cache_prompt):
+        from .gemini_cache import cache_enabled, get_cached_response
+        
+        if not cache_enabled():
+            return None
+        if self.bypass_cache:
+            increment('gemini_cache_requests_total', method=method, outcome='bypass')
+            return None
+        return get_cached_response(self.model.model_name, method, cache_prompt)
+    
+    def _cache_store(self, method, cache_prompt, text):
+        from .gemini_cache import cache_enabled, store_response
+        
+        if cache_enabled():
+            store_response(self.model.model_name, method, cache_prompt, text)
+    
+    def _cache_prompt(self, prompt, generation_config):
+        # A response schema changes the answer, so it is part of the cache key
+        if generation_config:
+            return f'{prompt}\n{json.dumps(generation_config, sort_keys=True)}'
+        return prompt
+    
+    def _record_usage(self, method, response):
+        self.usage['calls'] += 1
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        counts = {field: getattr(usage_metadata, field, 0) or 0
+                  for field in ('prompt_token_count', 'candidates_token_count', 'total_token_count')}
+        self.usage.update(counts)
+        increment('gemini_tokens_total', counts['prompt_token_count'], method=method, direction='input')
+        increment('gemini_tokens_total', counts['candidates_token_count'], method=method, direction='output')
+        logger.info(
+            'Gemini %s: %d input tokens, %d output tokens',
+            method, counts['prompt_token_count'], counts['candidates_token_count']
+        )
     
+    @span('gemini_analyze_cv', metric='gemini_call_seconds')
     def analyze_cv(self, cv_text, job_description=""):
-        prompt = f"""
+        try:
+            return self.generate_text(
+                'analyze_cv', self.analysis_prompt(cv_text, job_description), ANALYSIS_CONFIG, parse=AnalysisResult
+            ).as_dict()
+        except (GeminiUnavailableError, SchemaError):
+            return self.degraded_analysis(cv_text, job_description)
+    
+    @span('gemini_generate_optimized_cv', metric='gemini_call_seconds')
+    def generate_optimized_cv(self, cv_text, analysis_data):
+        try:
+            return self.generate_text('generate_optimized_cv', self.optimized_cv_prompt(cv_text, analysis_data))
+        except GeminiUnavailableError:
+            # Left empty so the AI-optimized page streams a version once Gemini is back
+            return ''
+    
+    @span('gemini_analyze_and_optimize', metric='gemini_call_seconds')
+    def analyze_and_optimize(self, cv_text, job_description=""):
+        """Get the analysis and optimized CV text, in one structured call unless GEMINI_COMBINED_ANALYSIS is off"""
+        if getattr(settings, 'GEMINI_COMBINED_ANALYSIS', True):
+            try:
+                result = self.generate_text(
+                    'analyze_and_optimize', self.combined_prompt(cv_text, job_description), COMBINED_CONFIG,
+                    parse=CombinedResult
+                )
+                return result.analysis.as_dict(), result.optimized_cv
+            except GeminiUnavailableError:
+                return self.degraded_analysis(cv_text, job_description), ''
+            except SchemaError:
+                pass
+        
+        # Two-call path, also the fallback for malformed structured output
+        analysis = self.analyze_cv(cv_text, job_description)
+        if analysis.get('degraded'):
+            return analysis, ''
+        return analysis, self.generate_optimized_cv(cv_text, analysis)
+    
+    @span('gemini_find_matching_jobs', metric='gemini_call_seconds')
+    def find_matching_jobs(self, cv_analysis, location=""):
+        try:
+            return self.generate_text(
+                'find_matching_jobs', self.matching_jobs_prompt(cv_analysis, location), JOBS_CONFIG, parse=JobSuggestions
+            ).as_dict()
+        except (GeminiUnavailableError, SchemaError):
+            increment('gemini_degraded_total', method='find_matching_jobs')
+            return dict(FALLBACK_JOB_SUGGESTIONS, degraded=True)
+    
+    @span('gemini_get_application_guide', metric='gemini_call_seconds')
+    def get_application_guide(self, job_title, company_name=""):
+        try:
+            return self.generate_text('get_application_guide', self.application_guide_prompt(job_title, company_name))
+        except GeminiUnavailableError:
+            increment('gemini_degraded_total', method='get_application_guide')
+            return DEGRADED_GUIDE
+    
+    def degraded_analysis(self, cv_text, job_description):
+        """Score the CV with the local keyword scorer, in the shape of a Gemini analysis"""
+        from .utils import analyze_cv
+        
+        increment('gemini_degraded_total', method='analyze_cv')
+        report = analyze_cv(None, job_description, cv_text=cv_text)
+        structure = report.get('structure_analysis', {})
+        missing_sections = [
+            name for name, flag in (('Experience', 'has_experience_section'), ('Education', 'has_education_section'),
+                                    ('Skills', 'has_skills_section'))
+            if structure and not structure.get(flag)
+        ]
+        return {
+            'ats_score': report['score'],
+            'missing_sections': missing_sections,
+            'improvements': report['suggestions'],
+            'keyword_suggestions': report.get('missing_keywords', [])[:10],
+            'optimized_sections': {},
+            'job_match_percentage': report['score'],
+            # Shown on the results page; Regenerate Analysis asks Gemini again
+            'degraded': True
+        }
+    
+    def analysis_prompt(self, cv_text, job_description):
+        return f"""
         Analyze this CV and provide detailed feedback:
         
-        CV Content: {cv_text}
+        CV Content: {self.prompt_builder.compact_cv(cv_text)}
         Job Description: {job_description}
         
         Provide response in JSON format:
@@ -29,19 +309,13 @@ class GeminiCVAnalyzer:
             "job_match_percentage": 75
         }}
         """
-        
-        response = self.model.generate_content(prompt)
-        try:
-            return json.loads(response.text)
-        except:
-            return self._parse_response(response.text)
     
-    def generate_optimized_cv(self, cv_text, analysis_data):
-        prompt = f"""
+    def optimized_cv_prompt(self, cv_text, analysis_data):
+        return f"""
         Create an ATS-optimized CV based on this analysis:
         
-        Original CV: {cv_text}
-        Analysis: {analysis_data}
+        Original CV: {self.prompt_builder.compact_cv(cv_text)}
+        Analysis: {compact_json(analysis_data)}
         
         Generate a complete, professional CV with:
         - ATS-friendly formatting
@@ -53,15 +327,28 @@ class GeminiCVAnalyzer:
         
         Return only the CV content in plain text format.
         """
+    
+    def combined_prompt(self, cv_text, job_description):
+        return f"""
+        Analyze this CV for the job below, then rewrite it as an ATS-optimized CV.
         
-        response = self.model.generate_content(prompt)
-        return response.text
+        CV Content: {self.prompt_builder.compact_cv(cv_text)}
+        Job Description: {job_description}
+        
+        In the JSON response:
+        - ats_score and job_match_percentage are 0-100
+        - missing_sections, improvements and keyword_suggestions are short lists
+        - optimized_sections holds improved summary, experience and skills sections
+        - optimized_cv is the complete optimized CV in plain text, with ATS-friendly
+          formatting, relevant keywords, quantified achievements, a professional
+          summary, a skills section and experience with impact metrics
+        """
     
-    def find_matching_jobs(self, cv_analysis, location=""):
-        prompt = f"""
+    def matching_jobs_prompt(self, cv_analysis, location):
+        return f"""
         Based on this CV analysis, suggest job search terms and job types:
         
-        Analysis: {cv_analysis}
+        Analysis: {compact_json(cv_analysis)}
         Location: {location}
         
         Provide JSON response:
@@ -72,15 +359,11 @@ class GeminiCVAnalyzer:
             "application_tips": ["Customize resume for each job", "Write compelling cover letter"]
         }}
         """
-        
-        response = self.model.generate_content(prompt)
-        try:
-            return json.loads(response.text)
-        except:
-            return self._parse_job_response(response.text)
     
-    def get_application_guide(self, job_title, company_name=""):
-        prompt = f"""
+    def application_guide_prompt(self, job_title, company_name):
+        # Spacing differences should not make a new prompt, so the same posting shares cache entries and calls
+        job_title, company_name = ' '.join(job_title.split()), ' '.join(company_name.split())
+        return f"""
         Provide a comprehensive job application guide for:
         Job Title: {job_title}
         Company: {company_name}
@@ -94,25 +377,22 @@ class GeminiCVAnalyzer:
         
         Format as structured text.
         """
-        
-        response = self.model.generate_content(prompt)
-        return response.text
     
-    def _parse_response(self, text):
-        # Fallback parser for non-JSON responses
-        return {
-            "ats_score": 70,
-            "missing_sections": ["Skills"],
-            "improvements": ["Improve formatting", "Add keywords"],
-            "keyword_suggestions": ["Relevant skills"],
-            "optimized_sections": {"summary": "Professional summary needed"},
-            "job_match_percentage": 65
-        }
-    
-    def _parse_job_response(self, text):
-        return {
-            "job_titles": ["Software Developer"],
-            "search_keywords": ["programming"],
-            "job_portals": ["LinkedIn", "Indeed"],
-            "application_tips": ["Tailor your resume"]
-        }
\ No newline at end of file
+    def custom_job_search_prompt(self, job_title, location, skills, experience, cv_analysis):
+        return f"""
+            Generate a smart job search for:
+            Job Title: {job_title}
+            Location: {location}
+            Skills: {skills}
+            Experience: {experience}
+            CV Analysis: {compact_json(cv_analysis)}
+            
+            Provide:
+            1. Optimized search keywords
+            2. Alternative job titles to search
+            3. Required skills to highlight
+            4. Salary expectations
+            5. Company recommendations
+            
+            Return as JSON format.
+            """
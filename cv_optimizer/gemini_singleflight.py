@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from django.conf import settings
+from .metrics import increment
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: calls are only coalesced within a process there
+    fcntl = None
+
+LOCK_POLL_SECONDS = 0.05
+# Keys share this many lock files, so the lock directory stays a fixed size
+LOCK_STRIPES = 4096
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+_async_flights = {}
+
+def flight_key(*parts):
+    """Hash the parts identifying a call (model, method, prompt) into a flight key"""
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def coalescing_enabled():
+    return getattr(settings, 'GEMINI_COALESCE', True)
+
+def _lock_path(key):
+    directory = str(settings.GEMINI_LOCK_DIR)
+    os.makedirs(directory, exist_ok=True)
+    stripe = int(key[:8], 16) % LOCK_STRIPES
+    return os.path.join(directory, f'gemini-{stripe:04d}.lock')
+
+def _try_lock(handle):
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+def _unlock(handle, locked):
+    if locked:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+    handle.close()
+
+def _open_lock(key):
+    """Open the key's lock file and try to take it, returning (handle, locked)"""
+    handle = open(_lock_path(key), 'a')
+    return handle, _try_lock(handle)
+
+def _run_leader(method, key, call, recheck):
+    if recheck is None or fcntl is None:
+        return call()
+    handle, locked = _open_lock(key)
+    waited = not locked
+    try:
+        deadline = time.monotonic() + settings.GEMINI_TIMEOUT
+        # Another process is making the same call; past the deadline we stop waiting and make our own
+        while not locked and time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            locked = _try_lock(handle)
+        if waited:
+            result = recheck()
+            if result is not None:
+                increment('gemini_coalesced_total', method=method, scope='process')
+                return result
+        return call()
+    finally:
+        _unlock(handle, locked)
+
+def single_flight(method, key, call, recheck=None):
+    """Run call() once for all threads asking for the same key at the same time.
+
+    Threads arriving while a call is in flight wait for it and get its
+    result or its exception. With recheck, the call also takes a file lock
+    for the key: a process that had to wait for another one first runs
+    recheck() (e.g. a response cache lookup) and only calls if it gives None.
+    """
+    if not coalescing_enabled():
+        return call()
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        increment('gemini_coalesced_total', method=method, scope='thread')
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _run_leader(method, key, call, recheck)
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+async def _run_leader_async(method, key, call, recheck):
+    if recheck is None or fcntl is None:
+        return await call()
+    handle, locked = _open_lock(key)
+    waited = not locked
+    try:
+        deadline = time.monotonic() + settings.GEMINI_TIMEOUT
+        while not locked and time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            locked = _try_lock(handle)
+        if waited:
+            result = await recheck()
+            if result is not None:
+                increment('gemini_coalesced_total', method=method, scope='process')
+                return result
+        return await call()
+    finally:
+        _unlock(handle, locked)
+
+async def single_flight_async(method, key, call, recheck=None):
+    """single_flight for coroutines: tasks on one event loop share an awaited call() and recheck()"""
+    if not coalescing_enabled():
+        return await call()
+    loop = asyncio.get_running_loop()
+    flight_id = (loop, key)
+    while flight_id in _async_flights:
+        future = _async_flights[flight_id]
+        try:
+            # Shielded, so a waiter going away does not cancel the call for the others
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The task making the call was cancelled (its client left); the next waiter takes over
+            if not future.cancelled():
+                raise
+            continue
+        except Exception:
+            pass
+        increment('gemini_coalesced_total', method=method, scope='task')
+        return future.result()
+
+    future = _async_flights[flight_id] = loop.create_future()
+    try:
+        result = await _run_leader_async(method, key, call, recheck)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        # Marks the exception as retrieved when nobody was waiting for it
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        del _async_flights[flight_id]
@@ -0,0 +1,182 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .eviction import EvictionTrigger, evict_lru
+from .metrics import increment
+from .models import ApplicationGuide
+
+logger = logging.getLogger(__name__)
+
+# Guides nobody has opened for this long are deleted; views can name any title, so rows must not pile up
+IDLE_DAYS = 30
+
+def normalize(value, max_length):
+    """Collapse whitespace and case so the same posting always maps to one guide"""
+    return ' '.join((value or '').split()).lower()[:max_length]
+
+def guide_key(job_data):
+    """Build the lookup fields identifying the stored guide for a job"""
+    return {
+        'title_key': normalize(job_data.get('title'), 200),
+        'company_key': normalize(job_data.get('company'), 100),
+        'portal_key': normalize(job_data.get('portal'), 50)
+    }
+
+def is_stale(guide):
+    return timezone.now() - guide.generated_at > timedelta(seconds=settings.APPLICATION_GUIDE_MAX_AGE)
+
+def guide_context(guide):
+    """The parts of JobMatcher.build_application_guide the guide page shows"""
+    return {
+        'guide': guide.guide,
+        'portal_specific_tips': guide.portal_tips,
+        'application_checklist': guide.checklist
+    }
+
+def store_guide(job_data, text):
+    """Store a generated guide with its portal tips and checklist, returning the row.
+
+    A fallback guide served while Gemini is unavailable is returned unsaved,
+    so the next view or warmer run tries again.
+    """
+    from .gemini_service import DEGRADED_GUIDE
+    from .job_matcher import JobMatcher
+
+    guide_data = JobMatcher().build_application_guide(job_data, text)
+    fields = {
+        'job_title': ' '.join((job_data.get('title') or '').split())[:200],
+        'company': ' '.join((job_data.get('company') or '').split())[:100],
+        'portal': (job_data.get('portal') or '').strip()[:50],
+        'guide': text,
+        'portal_tips': guide_data['portal_specific_tips'],
+        'checklist': guide_data['application_checklist'],
+        'generated_at': timezone.now()
+    }
+    if text == DEGRADED_GUIDE:
+        return ApplicationGuide(**guide_key(job_data), **fields)
+    guide, created = ApplicationGuide.objects.update_or_create(
+        **guide_key(job_data), defaults=dict(fields, refresh_started_at=None)
+    )
+    if created:
+        _eviction.stored()
+    return guide
+
+def evict_guides(max_entries=None):
+    """Delete guides idle for IDLE_DAYS and the least recently used ones beyond max_entries"""
+    if max_entries is None:
+        max_entries = settings.APPLICATION_GUIDE_MAX_ENTRIES
+    cutoff = timezone.now() - timedelta(days=IDLE_DAYS)
+    # Warmed guides that were never opened count from when they were generated
+    idle, evicted = evict_lru(
+        ApplicationGuide.objects.all(), Coalesce('last_viewed_at', 'generated_at'), max_entries,
+        expired=Q(last_viewed_at__lt=cutoff) | Q(last_viewed_at__isnull=True, generated_at__lt=cutoff)
+    )
+    if idle or evicted:
+        increment('application_guide_evictions_total', idle + evicted)
+    return idle, evicted
+
+_eviction = EvictionTrigger(evict_guides)
+
+def generate_guide(job_data, bypass_cache=False):
+    """Ask Gemini for a guide and store it"""
+    from .gemini_service import GeminiCVAnalyzer
+
+    text = GeminiCVAnalyzer(bypass_cache=bypass_cache).get_application_guide(
+        job_data.get('title', ''), job_data.get('company', '')
+    )
+    return store_guide(job_data, text)
+
+def claim_refresh(guide):
+    """Mark a guide as being refreshed; False if another refresh already has it.
+
+    Like claiming an analysis job, this is a conditional UPDATE, so racing
+    requests in any process see exactly one success. A claim older than
+    twice GEMINI_TIMEOUT belonged to a refresh that died and may be retaken.
+    """
+    now = timezone.now()
+    expired = now - timedelta(seconds=2 * settings.GEMINI_TIMEOUT)
+    return ApplicationGuide.objects.filter(pk=guide.pk).filter(
+        Q(refresh_started_at__isnull=True) | Q(refresh_started_at__lt=expired)
+    ).update(refresh_started_at=now) == 1
+
+def refresh_guide(guide_id, job_data):
+    """Regenerate a claimed guide, releasing the claim whatever happens"""
+    try:
+        guide = generate_guide(job_data, bypass_cache=True)
+        # An unsaved guide is the fallback text: the stored one is kept and retried on a later view
+        increment('application_guide_refreshes_total', outcome='ok' if guide.pk else 'degraded')
+    except Exception:
+        increment('application_guide_refreshes_total', outcome='failed')
+        logger.exception('Refreshing application guide %s failed', guide_id)
+    finally:
+        ApplicationGuide.objects.filter(pk=guide_id).update(refresh_started_at=None)
+        close_old_connections()
+
+def refresh_in_background(guide, job_data):
+    """Start regenerating a stale guide on a thread, unless a refresh is already running"""
+    if not claim_refresh(guide):
+        return False
+    threading.Thread(target=refresh_guide, args=(guide.pk, job_data), daemon=True).start()
+    return True
+
+def record_view(guide):
+    if guide.pk:
+        ApplicationGuide.objects.filter(pk=guide.pk).update(view_count=F('view_count') + 1, last_viewed_at=timezone.now())
+
+def find_guide(job_data):
+    """Return the stored guide for a job, or None, counting the view.
+
+    A stale guide is still returned, and refreshed in the background for
+    the next viewer.
+    """
+    guide = ApplicationGuide.objects.filter(**guide_key(job_data)).first()
+    if guide is None:
+        increment('application_guide_requests_total', outcome='miss')
+        return None
+    record_view(guide)
+    if is_stale(guide):
+        increment('application_guide_requests_total', outcome='stale')
+        refresh_in_background(guide, job_data)
+    else:
+        increment('application_guide_requests_total', outcome='hit')
+    return guide
+
+def get_guide(job_data):
+    """Return the guide page data for a job, generating the guide on this request only if none is stored"""
+    guide = find_guide(job_data)
+    if guide is None:
+        guide = generate_guide(job_data)
+        record_view(guide)
+    return guide_context(guide)
+
+def warm_candidates(limit, ahead_seconds=0):
+    """Jobs worth generating guides for ahead of views, as (job_data, refresh) pairs.
+
+    First the most viewed stored guides that are stale, or will be within
+    ahead_seconds, then the newest job listings with no fresh guide.
+    refresh is True for jobs that already have a stored guide.
+    """
+    from job_scraper.models import JobListing
+
+    cutoff = timezone.now() - timedelta(seconds=settings.APPLICATION_GUIDE_MAX_AGE - ahead_seconds)
+    candidates = {}
+    stale = ApplicationGuide.objects.filter(generated_at__lt=cutoff).order_by('-view_count', '-last_viewed_at')
+    for guide in stale[:limit]:
+        job_data = {'title': guide.job_title, 'company': guide.company, 'portal': guide.portal}
+        candidates[(guide.title_key, guide.company_key, guide.portal_key)] = (job_data, True)
+
+    stored = set(ApplicationGuide.objects.values_list('title_key', 'company_key', 'portal_key'))
+    listings = JobListing.objects.filter(is_recent=True).select_related('portal').order_by('-posted_date')
+    for listing in listings.iterator():
+        if len(candidates) >= limit:
+            break
+        job_data = {'title': listing.title, 'company': listing.company, 'portal': listing.portal.name}
+        key = tuple(guide_key(job_data).values())
+        if key not in stored:
+            candidates.setdefault(key, (job_data, False))
+    return list(candidates.values())
@@ -23,10 +23,20 @@ class JobMatcher:
         else:
             # Use Gemini to find matching jobs from CV
             job_suggestions = self.gemini_analyzer.find_matching_jobs(cv_analysis, location)
-            jobs = []
-            for title in job_suggestions.get('job_titles', []):
-                portal_jobs = self._search_jobs(title, location, limit//len(job_suggestions.get('job_titles', [1])))
-                jobs.extend(portal_jobs)
+            return self.jobs_for_suggestions(job_suggestions, location, limit)
+        
+        return {
+            'jobs': jobs[:limit],
+            'search_suggestions': job_suggestions,
+            'total_found': len(jobs)
+        }
+    
+    def jobs_for_suggestions(self, job_suggestions, location="", limit=20):
+        """Search jobs for each title Gemini suggested"""
+        jobs = []
+        for title in job_suggestions.get('job_titles', []):
+            portal_jobs = self._search_jobs(title, location, limit//len(job_suggestions.get('job_titles', [1])))
+            jobs.extend(portal_jobs)
         
         return {
             'jobs': jobs[:limit],
@@ -101,7 +111,10 @@ class JobMatcher:
             job_data.get('title', ''),
             job_data.get('company', '')
         )
-        
+        return self.build_application_guide(job_data, guide)
+    
+    def build_application_guide(self, job_data, guide):
+        """Combine a generated guide with portal tips and the application checklist"""
         return {
             'guide': guide,
             'portal_specific_tips': self._get_portal_tips(job_data.get('portal', '')),
@@ -0,0 +1,87 @@
+import threading
+import uuid
+from collections import OrderedDict
+from django.core.cache import cache
+from .utils import JOB_KEYWORDS, get_job_keywords
+
+VERSION_KEY = 'cv_optimizer:keyword_index_version'
+# Roles come from user text (job roles, job descriptions), so only the most recent ones are kept
+MAX_CACHED_ROLES = 256
+
+class KeywordIndex:
+    """In-process snapshot of ATSKeyword rows grouped by category.
+
+    Built-in role keywords from get_job_keywords are extended with the
+    keywords of every category named in the job role, and each keyword is
+    weighted by its ATSKeyword.weight (1 when it has no row).
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.categories = {}
+        self.weights = {}
+        for keyword, category, weight in rows:
+            self.categories.setdefault(category.strip().lower(), []).append(keyword)
+            self.weights[keyword.lower()] = max(weight, 0)
+        self._roles = OrderedDict()
+        self._roles_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version):
+        from .models import ATSKeyword
+        rows = ATSKeyword.objects.order_by('category', 'keyword').values_list('keyword', 'category', 'weight')
+        return cls(list(rows), version)
+
+    def keywords_for_role(self, job_role):
+        """Get the (keywords, weights) tuples used to score a job role"""
+        role_key = job_role.strip().lower()
+        with self._roles_lock:
+            entry = self._roles.get(role_key)
+            if entry is not None:
+                self._roles.move_to_end(role_key)
+                return entry
+
+        keywords = get_job_keywords(job_role)
+        for category, category_keywords in self.categories.items():
+            if category in role_key:
+                keywords.extend(kw for kw in category_keywords if kw not in keywords)
+        weights = [self.weights.get(kw.lower(), 1) for kw in keywords]
+        entry = (tuple(keywords), tuple(weights))
+        with self._roles_lock:
+            self._roles[role_key] = entry
+            if len(self._roles) > MAX_CACHED_ROLES:
+                self._roles.popitem(last=False)
+        return entry
+
+    def all_roles(self):
+        """Get {role: (keywords, weights)} for every built-in role and category"""
+        roles = list(JOB_KEYWORDS) + [category for category in self.categories if category not in JOB_KEYWORDS]
+        return {role: self.keywords_for_role(role) for role in roles}
+
+_index = None
+_lock = threading.Lock()
+
+def invalidate_keyword_index(**kwargs):
+    """Publish a new version stamp so every worker rebuilds its index"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+def get_keyword_index():
+    """Get this worker's keyword index, rebuilding it only after invalidation.
+
+    The hot path is a single cache read of the version stamp; the keyword
+    table is only queried when the stamp changes. Bulk queryset updates
+    bypass model signals, so call invalidate_keyword_index() after them.
+    """
+    global _index
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = KeywordIndex.build(version)
+            index = _index
+    return index
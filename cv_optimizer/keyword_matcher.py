@@ -0,0 +1,140 @@
+import re
+from collections import deque
+from functools import lru_cache
+
+# Word tokens; trailing + and # keep terms like c++ and c# intact
+TOKEN_RE = re.compile(r'[a-z0-9]+[+#]*')
+WORD_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789')
+# Below this many keywords a regex scan per keyword beats the automaton's token loop
+# ('manage.py benchmark keywords' shows the crossover)
+SCAN_MAX_KEYWORDS = 40
+
+def tokenize_keyword(keyword):
+    """Split a keyword into the word tokens the matcher compares against"""
+    return TOKEN_RE.findall(keyword.lower())
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over word tokens for a fixed keyword list.
+
+    Keywords match on whole-token boundaries, so 'java' does not match
+    'javascript' and 'node.js' matches 'Node.js' or 'node js'. Offsets are
+    character positions in the lowercased text.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self._max_length = 0
+
+        for index, keyword in enumerate(self.keywords):
+            tokens = tokenize_keyword(keyword)
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[state][token] = next_state
+                state = next_state
+            self._output[state] += ((index, len(tokens)),)
+            self._max_length = max(self._max_length, len(tokens))
+
+        # Breadth-first pass to link each state to its longest proper suffix
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """Yield (keyword_index, start, end) for every occurrence in one pass"""
+        goto, fail, output = self._goto, self._fail, self._output
+        starts = deque(maxlen=self._max_length or 1)
+        state = 0
+
+        for match in TOKEN_RE.finditer(text.lower()):
+            token = match.group()
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            starts.append(match.start())
+            for index, length in output[state]:
+                yield index, starts[-length], match.end()
+
+    def find_positions(self, text):
+        """Map each matched keyword index to its list of (start, end) spans"""
+        positions = {}
+        for index, start, end in self.iter_matches(text):
+            positions.setdefault(index, []).append((start, end))
+        return positions
+
+def _keyword_pattern(tokens):
+    """Regex for a keyword's tokens with the token boundaries TOKEN_RE would find.
+
+    The start boundary is checked by the caller, so the pattern begins with
+    a literal that re can search for quickly. Keywords whose tail repeats
+    their head (e.g. 'a a') are wrapped in a lookahead to find overlapping
+    occurrences too.
+    """
+    parts = [
+        re.escape(token) + (r'(?![+#])' if token[-1] in '+#' else r'(?![a-z0-9+#])')
+        for token in tokens
+    ]
+    pattern = '[^a-z0-9]*'.join(parts)
+    if any(tokens[size:] == tokens[:-size] for size in range(1, len(tokens))):
+        return re.compile(f'(?=({pattern}))')
+    return re.compile(f'({pattern})')
+
+class KeywordScanner:
+    """Same matches as KeywordMatcher, found with one C-level regex scan per keyword.
+
+    For the 15-30 keywords of a job role this is cheaper than tokenising the
+    whole CV in Python, and keywords whose tokens do not occur at all are
+    ruled out with plain substring checks.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._patterns = []
+        for index, keyword in enumerate(self.keywords):
+            tokens = tokenize_keyword(keyword)
+            if tokens:
+                self._patterns.append((index, tokens, _keyword_pattern(tokens)))
+
+    def iter_matches(self, text):
+        """Yield (keyword_index, start, end) for every occurrence, keyword by keyword"""
+        text = text.lower()
+        for index, tokens, pattern in self._patterns:
+            if not all(token in text for token in tokens):
+                continue
+            for match in pattern.finditer(text):
+                start, end = match.span(1)
+                if not start or text[start - 1] not in WORD_CHARS:
+                    yield index, start, end
+
+    find_positions = KeywordMatcher.find_positions
+
+@lru_cache(maxsize=256)
+def _build_matcher(keywords):
+    if len(keywords) <= SCAN_MAX_KEYWORDS:
+        return KeywordScanner(keywords)
+    return KeywordMatcher(keywords)
+
+def get_matcher(job_keywords):
+    """Get the compiled matcher for a keyword list, built once per process.
+
+    Short lists, like a single role's keywords, get a KeywordScanner;
+    longer ones the automaton, whose cost barely grows with the list.
+    """
+    return _build_matcher(tuple(job_keywords))
@@ -0,0 +1,83 @@
+import json
+import platform
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from cv_optimizer import benchmarks
+
+SUITES = {
+    'analysis': benchmarks.bench_analysis,
+    'gemini_client': benchmarks.bench_gemini_client,
+    'gemini_load': benchmarks.bench_gemini_load,
+    'gemini_modes': benchmarks.bench_gemini_modes,
+    'keywords': benchmarks.bench_keywords,
+    'matrix': benchmarks.bench_matrix,
+    'pdf_engines': benchmarks.bench_pdf_engines,
+    'startup': benchmarks.bench_startup,
+}
+
+class Command(BaseCommand):
+    help = 'Run a cv_optimizer performance benchmark suite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(SUITES), help='Benchmark suite to run')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement')
+        parser.add_argument('--json', action='store_true', help='Print raw JSON results')
+        parser.add_argument('--output', type=str, default='', help='Save the run as JSON for later comparison')
+        parser.add_argument('--baseline', type=str, default='', help='Compare against a run saved with --output')
+        parser.add_argument(
+            '--threshold', type=float, default=0.10,
+            help='Slowdown fraction counted as a regression (0.10 = 10%%)'
+        )
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        baseline = self._load_baseline(options['baseline'], suite) if options['baseline'] else None
+        try:
+            results = SUITES[suite](repeat=options['repeat'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            run = {
+                'suite': suite,
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'repeat': options['repeat'],
+                'results': results
+            }
+            with open(options['output'], 'w') as file:
+                json.dump(run, file, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for row in results:
+                self.stdout.write('  '.join(f'{key}={value}' for key, value in row.items()))
+
+        if baseline is not None:
+            self._report_comparison(suite, results, baseline, options['threshold'])
+
+        self.stdout.write(self.style.SUCCESS(f"Benchmark '{suite}' completed!"))
+
+    def _load_baseline(self, path, suite):
+        try:
+            with open(path) as file:
+                run = json.load(file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read baseline "{path}": {str(e)}')
+        if run.get('suite') != suite:
+            raise CommandError(f"Baseline is for suite '{run.get('suite')}', not '{suite}'")
+        return run['results']
+
+    def _report_comparison(self, suite, results, baseline, threshold):
+        comparison = benchmarks.compare_to_baseline(suite, results, baseline, threshold)
+        self.stdout.write(f'Compared with baseline (threshold {threshold:.0%}):')
+        for row in comparison:
+            line = '  '.join(f'{key}={value}' for key, value in row.items() if key not in ('change', 'regression'))
+            line = f"{line}  change={row['change']:+.1%}"
+            self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+
+        regressions = sum(1 for row in comparison if row['regression'])
+        if regressions:
+            raise CommandError(f'{regressions} measurement(s) regressed by more than {threshold:.0%}')
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from cv_optimizer.analysis_jobs import claim_next_job, requeue_stale_jobs, run_job, worker_name
+from cv_optimizer.metrics import publish_snapshot
+
+# Seconds between metrics snapshots while the queue is idle; one is also published after every job
+PUBLISH_INTERVAL = 60
+
+class Command(BaseCommand):
+    help = 'Run queued CV analysis jobs in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 for no limit)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600, help='Seconds before an unfinished job is requeued')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Attempts before a stalled job is failed')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        processed = 0
+        published = 0
+        self.stdout.write(f'Worker {worker} waiting for analysis jobs')
+
+        try:
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                requeued, failed = requeue_stale_jobs(options['stale_after'], options['max_attempts'])
+                if requeued or failed:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} and failed {failed} stalled jobs'))
+
+                job = claim_next_job(worker)
+                if job is None:
+                    if time.monotonic() - published >= PUBLISH_INTERVAL:
+                        published = self._publish_metrics(worker)
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                started = time.monotonic()
+                ok = run_job(job)
+                processed += 1
+                elapsed = time.monotonic() - started
+                if ok:
+                    self.stdout.write(f'Job {job.pk} for CV {job.cv_upload_id} done in {elapsed:.1f}s')
+                else:
+                    self.stdout.write(self.style.ERROR(f'Job {job.pk} for CV {job.cv_upload_id} failed (details in the log)'))
+                published = self._publish_metrics(worker)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} analysis jobs'))
+
+    def _publish_metrics(self, worker):
+        """Share this worker's stage timings with /admin/metrics/, returning when it was done"""
+        try:
+            publish_snapshot(worker)
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'Could not publish metrics: {str(e)}'))
+        return time.monotonic()
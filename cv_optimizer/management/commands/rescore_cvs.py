@@ -0,0 +1,166 @@
+import json
+import os
+from datetime import datetime, time
+from multiprocessing import Pool
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from cv_optimizer.batch_scoring import rescore_row
+from cv_optimizer.keyword_index import get_keyword_index
+from cv_optimizer.models import CVUpload, ExtractedText
+from cv_optimizer.text_cache import store_cv_text
+from cv_optimizer.utils import EXTRACTOR_VERSION
+
+SCORE_BUCKETS = [(0, 20), (20, 40), (40, 60), (60, 80), (80, 101)]
+
+class Command(BaseCommand):
+    help = 'Recompute stored ATS scores for uploaded CVs after keyword changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', type=str, default='', help='Only CVs whose job role contains this text')
+        parser.add_argument('--since', type=str, default='', help='Only CVs uploaded on or after YYYY-MM-DD')
+        parser.add_argument('--until', type=str, default='', help='Only CVs uploaded on or before YYYY-MM-DD')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows loaded and written per batch')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Scoring processes')
+        parser.add_argument('--dry-run', action='store_true', help='Report the score shift without saving')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last checkpointed row')
+        parser.add_argument(
+            '--checkpoint', type=str,
+            default=os.path.join(settings.BASE_DIR, 'rescore_cvs.checkpoint'),
+            help='File recording the last rescored row'
+        )
+
+    def handle(self, *args, **options):
+        queryset = self._filtered_queryset(options)
+        checkpoint = options['checkpoint']
+        last_id = self._load_checkpoint(checkpoint, options) if options['resume'] else 0
+
+        old_scores, new_scores = [], []
+        failed = 0
+        pool = None
+        if options['workers'] > 1:
+            # Forked workers must not inherit open database connections
+            connections.close_all()
+            pool = Pool(options['workers'])
+
+        try:
+            while True:
+                uploads = list(
+                    queryset.filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .only('id', 'job_role', 'original_cv', 'file_hash', 'ats_score')[:options['chunk_size']]
+                )
+                if not uploads:
+                    break
+
+                rows = self._build_rows(uploads)
+                if pool:
+                    results = pool.imap_unordered(rescore_row, rows, chunksize=16)
+                else:
+                    results = map(rescore_row, rows)
+
+                by_pk = {upload.pk: upload for upload in uploads}
+                changed = []
+                for pk, score, extracted_text, file_hash in results:
+                    upload = by_pk[pk]
+                    if file_hash and not upload.file_hash:
+                        upload.file_hash = file_hash
+                        if not options['dry_run']:
+                            CVUpload.objects.filter(pk=pk).update(file_hash=file_hash)
+                    if extracted_text is not None and file_hash and not options['dry_run']:
+                        store_cv_text(file_hash, extracted_text)
+                    if score is None:
+                        failed += 1
+                        continue
+
+                    old_scores.append(upload.ats_score)
+                    new_scores.append(score)
+                    if upload.ats_score != score:
+                        upload.ats_score = score
+                        changed.append(upload)
+
+                last_id = uploads[-1].pk
+                if not options['dry_run']:
+                    CVUpload.objects.bulk_update(changed, ['ats_score'])
+                    self._save_checkpoint(checkpoint, last_id, options)
+
+                self.stdout.write(f'Processed up to id {last_id}: {len(changed)} changed in this batch')
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        self._report(old_scores, new_scores, failed, options['dry_run'])
+        if not options['dry_run'] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def _filtered_queryset(self, options):
+        queryset = CVUpload.objects.all()
+        if options['role']:
+            queryset = queryset.filter(job_role__icontains=options['role'])
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=self._parse_date(options['since'], time.min))
+        if options['until']:
+            queryset = queryset.filter(created_at__lte=self._parse_date(options['until'], time.max))
+        return queryset
+
+    def _parse_date(self, value, at):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+        return timezone.make_aware(datetime.combine(day, at))
+
+    def _build_rows(self, uploads):
+        # Reuse cached extractions so workers only parse files never seen before
+        hashes = {upload.file_hash for upload in uploads if upload.file_hash}
+        cached = dict(
+            ExtractedText.objects.filter(file_hash__in=hashes, extractor_version=EXTRACTOR_VERSION)
+            .values_list('file_hash', 'text')
+        )
+        index = get_keyword_index()
+        return [
+            (upload.pk, upload.original_cv.path, *index.keywords_for_role(upload.job_role), cached.get(upload.file_hash))
+            for upload in uploads
+        ]
+
+    def _checkpoint_filters(self, options):
+        return {key: options[key] for key in ('role', 'since', 'until')}
+
+    def _load_checkpoint(self, checkpoint, options):
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as file:
+            state = json.load(file)
+        if state.get('filters') != self._checkpoint_filters(options):
+            raise CommandError('Checkpoint was written with different filters; rerun without --resume')
+        self.stdout.write(f"Resuming after id {state['last_id']}")
+        return state['last_id']
+
+    def _save_checkpoint(self, checkpoint, last_id, options):
+        with open(checkpoint, 'w') as file:
+            json.dump({'last_id': last_id, 'filters': self._checkpoint_filters(options)}, file)
+
+    def _report(self, old_scores, new_scores, failed, dry_run):
+        count = len(new_scores)
+        self.stdout.write(f'Scored {count} CVs, {failed} could not be read')
+        if not count:
+            return
+
+        changed = sum(1 for old, new in zip(old_scores, new_scores) if old != new)
+        mean_old = sum(old_scores) / count
+        mean_new = sum(new_scores) / count
+        self.stdout.write(f'Changed: {changed}')
+        self.stdout.write(f'Mean score: {mean_old:.2f} -> {mean_new:.2f} ({mean_new - mean_old:+.2f})')
+
+        self.stdout.write('Score distribution (before -> after):')
+        for low, high in SCORE_BUCKETS:
+            before = sum(1 for score in old_scores if low <= score < high)
+            after = sum(1 for score in new_scores if low <= score < high)
+            self.stdout.write(f'  {low:>3}-{min(high, 100):<3} {before:>6} -> {after:<6}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: no scores were saved'))
+        else:
+            self.stdout.write(self.style.SUCCESS('CV rescoring completed!'))
@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from cv_optimizer.guide_store import evict_guides, generate_guide, warm_candidates
+
+class Command(BaseCommand):
+    help = 'Generate application guides ahead of views for the most viewed and newest job listings (run off-peak)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help='Most guides to generate in this run')
+        parser.add_argument('--ahead-hours', type=float, default=12,
+                            help='Also refresh guides that will go stale within this many hours')
+        parser.add_argument('--max-seconds', type=float, default=0,
+                            help='Stop starting new guides after this long, so the run ends before peak hours (0 for no limit)')
+        parser.add_argument('--dry-run', action='store_true', help='List the jobs that would be warmed')
+
+    def handle(self, *args, **options):
+        candidates = warm_candidates(options['limit'], int(options['ahead_hours'] * 3600))
+        if options['dry_run']:
+            for job_data, refresh in candidates:
+                action = 'refresh' if refresh else 'new'
+                self.stdout.write(f"{action}: {job_data['title']} at {job_data['company']} ({job_data['portal']})")
+            return
+
+        idle, evicted = evict_guides()
+        if idle or evicted:
+            self.stdout.write(f'Deleted {idle} idle and {evicted} least recently viewed guides')
+
+        started = time.monotonic()
+        warmed = failed = 0
+        for job_data, refresh in candidates:
+            if options['max_seconds'] and time.monotonic() - started >= options['max_seconds']:
+                self.stdout.write(self.style.WARNING('Time budget used up; stopping early'))
+                break
+            # Refreshes skip the Gemini response cache, which would hand back the old guide
+            guide = generate_guide(job_data, bypass_cache=refresh)
+            if guide.pk:
+                warmed += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"Gemini unavailable for {job_data['title']} at {job_data['company']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {warmed} of {len(candidates)} application guides in {time.monotonic() - started:.1f}s'
+            + (f' ({failed} failed)' if failed else '')
+        ))
@@ -0,0 +1,244 @@
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator, contextmanager
+
+# Upper bounds in seconds, from cheap parsing steps up to slow Gemini calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    'cv_stage_seconds': 'Time spent in each CV analysis stage',
+    'gemini_call_seconds': 'Time spent in each GeminiCVAnalyzer call',
+    'gemini_time_to_first_token_seconds': 'Time from a streamed Gemini request to its first chunk',
+    'analysis_jobs_total': 'Background analysis jobs finished, by final status',
+    'cv_text_cache_hits': 'Extracted-text cache hits, per process',
+    'cv_text_cache_misses': 'Extracted-text cache misses, per process',
+    'cv_extraction_files': 'Files handled by the extraction sandbox, by outcome',
+    'cv_extraction_workers': 'Live extraction sandbox workers, per process',
+    'gemini_tokens_total': 'Gemini tokens used, by method and direction (input or output)',
+    'gemini_timeouts_total': 'Gemini attempts that ran out of time, by method',
+    'gemini_retries_total': 'Gemini attempts retried after a retryable error, by method',
+    'gemini_unavailable_total': 'Gemini calls given up on, by method and reason (circuit_open or failed)',
+    'gemini_degraded_total': 'Results served from local fallbacks while Gemini was unavailable or unusable, by method',
+    'gemini_replies_total': 'Structured Gemini replies, by method and outcome (clean, repaired or invalid)',
+    'analysis_regenerations_total': 'Regenerate Analysis requests, by what the previous analysis was (ai, degraded or none)',
+    'gemini_circuit_opened_total': 'Times the Gemini circuit breaker tripped open',
+    'gemini_circuit_state': 'Gemini circuit breaker state: 0 closed, 1 half open, 2 open',
+    'gemini_coalesced_total': 'Gemini calls saved by sharing an identical call in flight, by method and scope (thread, task or process)',
+    'gemini_async_in_flight': 'Gemini calls in flight from async views, per process',
+    'application_guide_requests_total': 'Application guide page views, by stored guide outcome (hit, stale or miss)',
+    'application_guide_refreshes_total': 'Background refreshes of stale application guides, by outcome (ok, degraded or failed)',
+    'application_guide_evictions_total': 'Stored application guides deleted as idle or over the size cap',
+    'gemini_cache_requests_total': 'Gemini response cache lookups, by method and outcome',
+    'gemini_cache_evictions_total': 'Gemini responses evicted to keep the cache under its size cap',
+}
+
+# Processes other than the one serving /admin/metrics/ (e.g. process_analysis_jobs) publish
+# snapshots to the default cache, which the metrics view merges with its own
+SNAPSHOT_KEY = 'cv_metrics:snapshot:{}'
+PROCESSES_KEY = 'cv_metrics:processes'
+# A process that stops publishing drops out after this long
+SNAPSHOT_TTL = 3600
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_local = threading.local()
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+def observe(name, seconds, **labels):
+    """Add a duration to a histogram"""
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _labels_key(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(seconds)
+
+def increment(name, amount=1, **labels):
+    """Add to a counter"""
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _labels_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value"""
+    with _lock:
+        _gauges.setdefault(name, {})[_labels_key(labels)] = value
+
+@contextmanager
+def record_timings():
+    """Collect the duration of every span finished inside the block into a dict"""
+    timings = {}
+    stack = getattr(_local, 'recorders', None)
+    if stack is None:
+        stack = _local.recorders = []
+    stack.append(timings)
+    try:
+        yield timings
+    finally:
+        stack.remove(timings)
+
+class span(ContextDecorator):
+    """Time a block or function into a histogram labelled with its stage.
+
+    Durations are also added to any record_timings() block open on the
+    same thread, so one upload's stages can be stored with it.
+    """
+
+    def __init__(self, stage, metric='cv_stage_seconds'):
+        self.stage = stage
+        self.metric = metric
+
+    def _recreate_cm(self):
+        # A fresh timer per decorated call keeps concurrent threads and coroutines apart
+        return span(self.stage, self.metric)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        observe(self.metric, seconds, stage=self.stage)
+        for timings in getattr(_local, 'recorders', ()):
+            timings[self.stage] = round(timings.get(self.stage, 0) + seconds, 4)
+        return False
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _header(lines, name, kind):
+    lines.append(f'# HELP {name} {HELP.get(name, name)}')
+    lines.append(f'# TYPE {name} {kind}')
+
+def snapshot():
+    """Copy this process's metrics as plain data that can be stored and merged"""
+    with _lock:
+        return {
+            'histograms': {name: {key: (h.buckets, list(h.counts), h.total, h.count) for key, h in series.items()}
+                           for name, series in _histograms.items()},
+            'counters': {name: dict(series) for name, series in _counters.items()},
+            'gauges': {name: dict(series) for name, series in _gauges.items()},
+        }
+
+def process_name():
+    """Identify this process in published snapshots and claimed jobs"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def record_process_gauges():
+    """Set the gauges read from this process's text cache and extraction sandbox"""
+    from .extraction_pool import extraction_stats
+    from .text_cache import cache_stats
+
+    text_cache = cache_stats()
+    set_gauge('cv_text_cache_hits', text_cache['hits'])
+    set_gauge('cv_text_cache_misses', text_cache['misses'])
+    sandbox = extraction_stats()
+    if sandbox:
+        set_gauge('cv_extraction_workers', sandbox.pop('workers'))
+        for outcome, count in sandbox.items():
+            set_gauge('cv_extraction_files', count, outcome=outcome)
+
+def publish_snapshot(process=None):
+    """Store this process's metrics in the default cache for the metrics view to merge"""
+    from django.core.cache import cache
+
+    process = process or process_name()
+    record_process_gauges()
+    cache.set(SNAPSHOT_KEY.format(process), snapshot(), SNAPSHOT_TTL)
+    # Read-modify-write: a process lost to a concurrent update is re-added on its next publish
+    now = time.time()
+    processes = {name: seen for name, seen in (cache.get(PROCESSES_KEY) or {}).items() if now - seen < SNAPSHOT_TTL}
+    processes[process] = now
+    cache.set(PROCESSES_KEY, processes, None)
+
+def published_snapshots(exclude=None):
+    """Get the snapshots other processes published, by process name"""
+    from django.core.cache import cache
+
+    keys = {SNAPSHOT_KEY.format(name): name for name in (cache.get(PROCESSES_KEY) or {}) if name != exclude}
+    return {keys[key]: data for key, data in cache.get_many(list(keys)).items()}
+
+def merge_snapshots(snapshots):
+    """Combine snapshots by process name into one.
+
+    Histograms and counters are summed across processes. Gauges describe
+    one process, so each keeps a process label instead.
+    """
+    merged = {'histograms': {}, 'counters': {}, 'gauges': {}}
+    for process, data in sorted(snapshots.items()):
+        for name, series in data['histograms'].items():
+            target = merged['histograms'].setdefault(name, {})
+            for key, (buckets, counts, total, count) in series.items():
+                if key not in target:
+                    target[key] = (buckets, list(counts), total, count)
+                elif target[key][0] == buckets:
+                    _, merged_counts, merged_total, merged_count = target[key]
+                    target[key] = (
+                        buckets, [a + b for a, b in zip(merged_counts, counts)], merged_total + total, merged_count + count
+                    )
+        for name, series in data['counters'].items():
+            target = merged['counters'].setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+        for name, series in data['gauges'].items():
+            target = merged['gauges'].setdefault(name, {})
+            for key, value in series.items():
+                target[_labels_key(dict(key, process=process))] = value
+    return merged
+
+def render_prometheus(data=None):
+    """Render every metric in the Prometheus text exposition format, from this process unless data is given"""
+    if data is None:
+        data = snapshot()
+    histograms, counters, gauges = data['histograms'], data['counters'], data['gauges']
+
+    lines = []
+    for name in sorted(histograms):
+        _header(lines, name, 'histogram')
+        for key, (buckets, counts, total, count) in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f'{name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{name}_count{_format_labels(key)} {count}')
+    for name in sorted(counters):
+        _header(lines, name, 'counter')
+        for key, value in sorted(counters[name].items()):
+            lines.append(f'{name}{_format_labels(key)} {value}')
+    for name in sorted(gauges):
+        _header(lines, name, 'gauge')
+        for key, value in sorted(gauges[name].items()):
+            lines.append(f'{name}{_format_labels(key)} {value}')
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    """Drop all collected metrics"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_optimizer', '0004_extractedtext_cvupload_file_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CVAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_hash', models.CharField(max_length=64)),
+                ('job_role', models.CharField(max_length=200)),
+                ('keyword_version', models.CharField(max_length=64)),
+                ('scorer_version', models.PositiveIntegerField()),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('file_hash', 'job_role', 'keyword_version', 'scorer_version')},
+            },
+        ),
+    ]
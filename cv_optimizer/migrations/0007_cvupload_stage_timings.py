@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_optimizer', '0006_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cvupload',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
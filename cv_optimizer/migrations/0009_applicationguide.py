@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_optimizer', '0008_geminiresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationGuide',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_key', models.CharField(max_length=200)),
+                ('company_key', models.CharField(max_length=100)),
+                ('portal_key', models.CharField(max_length=50)),
+                ('job_title', models.CharField(max_length=200)),
+                ('company', models.CharField(max_length=100)),
+                ('portal', models.CharField(max_length=50)),
+                ('guide', models.TextField()),
+                ('portal_tips', models.JSONField(default=list)),
+                ('checklist', models.JSONField(default=list)),
+                ('view_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('generated_at', models.DateTimeField(db_index=True)),
+                ('last_viewed_at', models.DateTimeField(blank=True, null=True)),
+                ('refresh_started_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('title_key', 'company_key', 'portal_key')},
+            },
+        ),
+    ]
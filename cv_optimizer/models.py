@@ -9,6 +9,7 @@ class CVUpload(models.Model):
     original_cv = models.FileField(upload_to='cvs/original/')
     optimized_cv = models.FileField(upload_to='cvs/optimized/', blank=True, null=True)
     ats_score = models.FloatField(default=0.0)
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True)
     
     # Gemini AI Analysis Fields
     gemini_analysis = models.JSONField(default=dict, blank=True)
@@ -18,6 +19,9 @@ class CVUpload(models.Model):
     job_match_percentage = models.FloatField(default=0.0)
     optimized_content = models.TextField(blank=True)
     
+    # Seconds spent in each analysis stage, recorded by the background job
+    stage_timings = models.JSONField(default=dict, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -30,6 +34,16 @@ class CVUpload(models.Model):
     def get_job_role_slug(self):
         return slugify(self.job_role)
     
+    def apply_gemini_analysis(self, analysis, optimized_content):
+        """Copy a Gemini analysis and optimized CV onto the upload without saving"""
+        self.gemini_analysis = analysis
+        self.ats_score = analysis.get('ats_score', 0)
+        self.missing_sections = analysis.get('missing_sections', [])
+        self.improvement_suggestions = analysis.get('improvements', [])
+        self.keyword_suggestions = analysis.get('keyword_suggestions', [])
+        self.job_match_percentage = analysis.get('job_match_percentage', 0)
+        self.optimized_content = optimized_content
+    
     def get_unique_id(self):
         # Get user's CV count for this specific job role
         user_cvs = CVUpload.objects.filter(
@@ -42,6 +56,103 @@ class CVUpload(models.Model):
                 return index
         return 1
 
+class ExtractedText(models.Model):
+    # Text extracted from an uploaded file, keyed by the SHA-256 of its bytes
+    file_hash = models.CharField(max_length=64)
+    extractor_version = models.PositiveIntegerField()
+    text = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['file_hash', 'extractor_version']
+
+    def __str__(self):
+        return f"{self.file_hash[:12]} (v{self.extractor_version})"
+
+class CVAnalysis(models.Model):
+    # Local ATS analysis of a file for one keyword set and scorer version
+    file_hash = models.CharField(max_length=64)
+    job_role = models.CharField(max_length=200)
+    keyword_version = models.CharField(max_length=64)
+    scorer_version = models.PositiveIntegerField()
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['file_hash', 'job_role', 'keyword_version', 'scorer_version']
+
+    def __str__(self):
+        return f"{self.file_hash[:12]} - {self.job_role} (v{self.scorer_version})"
+
+class AnalysisJob(models.Model):
+    # Background analysis of an upload, claimed and run by 'manage.py process_analysis_jobs'
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('extracting', 'Extracting'),
+        ('scoring', 'Scoring'),
+        ('optimizing', 'Optimizing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    cv_upload = models.ForeignKey(CVUpload, on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Job {self.pk} - {self.cv_upload} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+class GeminiResponse(models.Model):
+    # Cached Gemini response text, keyed by the SHA-256 of model name and prompt
+    cache_key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    method = models.CharField(max_length=50, db_index=True)
+    response_text = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.cache_key[:12]}"
+
+class ApplicationGuide(models.Model):
+    # Generated application guide for a posting, keyed by normalised title, company and portal
+    title_key = models.CharField(max_length=200)
+    company_key = models.CharField(max_length=100)
+    portal_key = models.CharField(max_length=50)
+    job_title = models.CharField(max_length=200)
+    company = models.CharField(max_length=100)
+    portal = models.CharField(max_length=50)
+    guide = models.TextField()
+    portal_tips = models.JSONField(default=list)
+    checklist = models.JSONField(default=list)
+    view_count = models.PositiveIntegerField(default=0, db_index=True)
+    generated_at = models.DateTimeField(db_index=True)
+    last_viewed_at = models.DateTimeField(null=True, blank=True)
+    # Set while a background refresh is running, so only one runs per guide
+    refresh_started_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['title_key', 'company_key', 'portal_key']
+
+    def __str__(self):
+        return f"{self.job_title} at {self.company} ({self.portal})"
+
 class ATSKeyword(models.Model):
     keyword = models.CharField(max_length=100, unique=True)
     category = models.CharField(max_length=50)
@@ -0,0 +1,146 @@
+import importlib.util
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+class PyPDF2Engine:
+    module = 'PyPDF2'
+
+    def page_count(self, file_path):
+        from PyPDF2 import PdfReader
+        with open(file_path, 'rb') as file:
+            return len(PdfReader(file).pages)
+
+    def iter_pages(self, file_path, start, stop):
+        from PyPDF2 import PdfReader
+        with open(file_path, 'rb') as file:
+            pages = PdfReader(file).pages
+            for number in range(start, min(stop, len(pages))):
+                yield pages[number].extract_text() or ''
+
+class PypdfEngine:
+    module = 'pypdf'
+
+    def page_count(self, file_path):
+        from pypdf import PdfReader
+        with open(file_path, 'rb') as file:
+            return len(PdfReader(file).pages)
+
+    def iter_pages(self, file_path, start, stop):
+        from pypdf import PdfReader
+        with open(file_path, 'rb') as file:
+            pages = PdfReader(file).pages
+            for number in range(start, min(stop, len(pages))):
+                yield pages[number].extract_text() or ''
+
+class PyMuPDFEngine:
+    module = 'pymupdf'
+
+    def page_count(self, file_path):
+        import pymupdf
+        with pymupdf.open(file_path) as document:
+            return document.page_count
+
+    def iter_pages(self, file_path, start, stop):
+        import pymupdf
+        with pymupdf.open(file_path) as document:
+            for number in range(start, min(stop, document.page_count)):
+                yield document[number].get_text()
+
+class PdfminerEngine:
+    module = 'pdfminer'
+
+    def page_count(self, file_path):
+        from pdfminer.pdfpage import PDFPage
+        with open(file_path, 'rb') as file:
+            return sum(1 for _ in PDFPage.get_pages(file))
+
+    def iter_pages(self, file_path, start, stop):
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+        stop = min(stop, self.page_count(file_path))
+        for layout in extract_pages(file_path, page_numbers=range(start, stop)):
+            yield ''.join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+
+PDF_ENGINES = {
+    'pymupdf': PyMuPDFEngine,
+    'pypdf': PypdfEngine,
+    'pypdf2': PyPDF2Engine,
+    'pdfminer': PdfminerEngine,
+}
+
+# Fastest first, from 'manage.py benchmark pdf_engines' on multi-page CVs
+ENGINE_PREFERENCE = ['pymupdf', 'pypdf2', 'pypdf', 'pdfminer']
+
+def available_engines():
+    """List the installed PDF engines in preference order"""
+    return [name for name in ENGINE_PREFERENCE if importlib.util.find_spec(PDF_ENGINES[name].module)]
+
+def resolve_engine(name='auto'):
+    """Resolve an engine name, picking the fastest installed one for 'auto'"""
+    if name == 'auto':
+        installed = available_engines()
+        if not installed:
+            raise RuntimeError('No PDF engine is installed')
+        return installed[0]
+    if name not in PDF_ENGINES:
+        raise ValueError(f'Unknown PDF engine "{name}"')
+    return name
+
+def get_engine(name='auto'):
+    """Get a PDF engine instance by name"""
+    return PDF_ENGINES[resolve_engine(name)]()
+
+def _extract_page_range(engine_name, file_path, start, stop):
+    return list(get_engine(engine_name).iter_pages(file_path, start, stop))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+def iter_pdf_pages(file_path, max_pages=None, engine='auto'):
+    """Yield the text of each page in order, stopping at max_pages"""
+    yield from get_engine(engine).iter_pages(file_path, 0, max_pages or sys.maxsize)
+
+def read_pdf_text(file_path, max_pages=None, engine='auto', parallel_min_pages=8, workers=None):
+    """Read PDF text page by page, fanning large files out to a process pool"""
+    engine = resolve_engine(engine)
+    workers = workers or os.cpu_count() or 1
+    # Pool workers are daemonic and cannot start processes of their own
+    if workers < 2 or multiprocessing.current_process().daemon:
+        return '\n'.join(iter_pdf_pages(file_path, max_pages, engine))
+
+    page_count = get_engine(engine).page_count(file_path)
+    if max_pages:
+        page_count = min(page_count, max_pages)
+    if page_count < parallel_min_pages:
+        return '\n'.join(iter_pdf_pages(file_path, page_count, engine))
+
+    chunk = -(-page_count // workers)
+    executor = _get_executor(workers)
+    try:
+        futures = [
+            executor.submit(_extract_page_range, engine, file_path, start, min(start + chunk, page_count))
+            for start in range(0, page_count, chunk)
+        ]
+        return '\n'.join(page for future in futures for page in future.result())
+    except BrokenProcessPool:
+        # A worker died; drop the broken pool so later files get a fresh one, and read this file serially
+        _reset_executor(executor)
+        return '\n'.join(iter_pdf_pages(file_path, page_count, engine))
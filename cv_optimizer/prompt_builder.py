@@ -0,0 +1,79 @@
+import json
+import logging
+import re
+from collections import Counter
+from .segmenter import segment_cv
+
+logger = logging.getLogger(__name__)
+
+# "Page 2", "2 of 3", "2/3" or a lone page number; four-digit lines are years, not pages
+PAGE_MARKER_RE = re.compile(r'^(page\s*\d+(\s*(of|/)\s*\d+)?|\d{1,3}\s*(of|/)\s*\d{1,3}|\d{1,2})$', re.IGNORECASE)
+INLINE_SPACE_RE = re.compile(r'[ \t\u00a0\u200b]+')
+# Short repeated lines are more likely real content ("Python", "Intern") than page furniture
+MIN_REPEATED_WORDS = 3
+CHARS_PER_TOKEN = 4
+TRIM_MARKER = '[...]'
+
+def estimate_tokens(text):
+    """Rough token count for when the model's counter is unavailable"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces within lines and of blank lines between them"""
+    lines = [INLINE_SPACE_RE.sub(' ', line).strip() for line in text.splitlines()]
+    compact = []
+    for line in lines:
+        if line or (compact and compact[-1]):
+            compact.append(line)
+    return '\n'.join(compact).strip()
+
+def strip_repeated_lines(text):
+    """Drop page numbers and all but the first copy of header or footer lines repeated on each page"""
+    lines = text.splitlines()
+    # Exact copies only: lines differing in a number ("by 20%" / "by 30%") are real content
+    keys = [line.lower() for line in lines]
+    repeats = Counter(key for key, line in zip(keys, lines) if len(line.split()) >= MIN_REPEATED_WORDS)
+    seen = set()
+    kept = []
+    for key, line in zip(keys, lines):
+        if PAGE_MARKER_RE.match(line):
+            continue
+        if repeats[key] > 1:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return '\n'.join(kept)
+
+def compact_json(data):
+    """Serialise an analysis dict without the whitespace str() and indent add"""
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str)
+
+class PromptBuilder:
+    """Compacts CV text for prompts, capping each section to a token budget.
+
+    Sections are measured with the local estimate only, so the same CV
+    always gives the same prompt, and so the same cache and single-flight
+    keys, whichever analyzer builds it.
+    """
+
+    def __init__(self, section_tokens=800):
+        self.section_tokens = section_tokens
+
+    def fit_section(self, text):
+        """Cut a section to its budget at a line boundary"""
+        tokens = estimate_tokens(text)
+        if tokens <= self.section_tokens:
+            return text
+        # Most recent roles and strongest points come first, so the tail is dropped
+        max_chars = len(text) * self.section_tokens // tokens
+        cut = text.rfind('\n', 0, max_chars)
+        return text[:cut if cut > 0 else max_chars].rstrip() + f'\n{TRIM_MARKER}'
+
+    def compact_cv(self, cv_text):
+        """Get the CV text to embed in a prompt"""
+        text = normalize_whitespace(strip_repeated_lines(normalize_whitespace(cv_text)))
+        segments = segment_cv(text)
+        compacted = '\n'.join(self.fit_section(text[section.start:section.end].strip()) for section in segments.sections)
+        logger.debug('Compacted CV text from %d to %d characters', len(cv_text), len(compacted))
+        return compacted
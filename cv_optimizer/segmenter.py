@@ -0,0 +1,106 @@
+import re
+from bisect import bisect_right
+from collections import namedtuple
+
+Section = namedtuple('Section', ['name', 'start', 'end', 'word_count'])
+
+# Heading terms per section; 'other' closes a section without starting a tracked one
+SECTION_HEADINGS = {
+    'summary': ['summary', 'professional summary', 'objective', 'career objective', 'profile', 'about me'],
+    'experience': ['experience', 'work experience', 'professional experience', 'work history', 'employment', 'internships'],
+    'education': ['education', 'qualification', 'qualifications', 'academic background', 'degree'],
+    'skills': ['skills', 'technical skills', 'key skills', 'competencies', 'core competencies'],
+    'projects': ['projects', 'academic projects', 'personal projects'],
+    'other': [
+        'certifications', 'certificates', 'achievements', 'awards', 'languages', 'interests',
+        'hobbies', 'references', 'publications', 'activities', 'volunteering'
+    ]
+}
+
+_HEADING_TERMS = {term: name for name, terms in SECTION_HEADINGS.items() for term in terms}
+_HEADING_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(term) for term in sorted(_HEADING_TERMS, key=len, reverse=True)) + r')\b'
+)
+EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+PHONE_RE = re.compile(r'[\+]?[1-9]?[0-9]{7,14}')
+NUMBERING_RE = re.compile(r'^\d+[.)]\s*')
+BULLET_CHARS = '•·*-–▪●◦‣■➢'
+SENTENCE_END = ('.', '!', '?', ';', ',')
+MAX_HEADING_WORDS = 4
+
+class CVSegments:
+    """Section spans and structural signals of a CV, from one pass over its lines.
+
+    Text before the first heading is the 'contact' block. Offsets are
+    character positions in the original text.
+    """
+
+    def __init__(self, sections, word_count, has_email, has_phone, has_bullets):
+        self.sections = sections
+        self.word_count = word_count
+        self.has_email = has_email
+        self.has_phone = has_phone
+        self.has_bullets = has_bullets
+        self._starts = [section.start for section in sections]
+
+    def has_section(self, name):
+        return any(section.name == name for section in self.sections)
+
+    def section_at(self, offset):
+        """Get the name of the section containing a character offset"""
+        position = bisect_right(self._starts, offset) - 1
+        return self.sections[position].name if position >= 0 else 'contact'
+
+    def spans(self):
+        """Get the sections as JSON-serialisable dicts"""
+        return [section._asdict() for section in self.sections]
+
+def _heading_name(line, word_count):
+    line = NUMBERING_RE.sub('', line)
+    if word_count > MAX_HEADING_WORDS or '@' in line or any(char.isdigit() for char in line):
+        return None
+    # Bullets and sentences that mention a heading term ('• Taught education workshops') are body text
+    if line.startswith(tuple(BULLET_CHARS)) or line.endswith(SENTENCE_END):
+        return None
+    match = _HEADING_RE.search(line.lower())
+    return _HEADING_TERMS[match.group(1)] if match else None
+
+def segment_cv(cv_text):
+    """Split a CV into section spans while collecting contact and bullet signals"""
+    sections = []
+    name, start, section_words = 'contact', 0, 0
+    word_count = 0
+    has_email = has_phone = has_bullets = False
+    offset = 0
+
+    for line in cv_text.splitlines(keepends=True):
+        stripped = line.strip()
+        words = len(stripped.split())
+
+        heading = _heading_name(stripped, words) if words else None
+        if heading:
+            if offset > start:
+                sections.append(Section(name, start, offset, section_words))
+            name, start, section_words = heading, offset, 0
+
+        section_words += words
+        word_count += words
+        if not has_email and '@' in line and EMAIL_RE.search(line):
+            has_email = True
+        if not has_phone and PHONE_RE.search(line):
+            has_phone = True
+        if not has_bullets and stripped and stripped[0] in BULLET_CHARS:
+            has_bullets = True
+        offset += len(line)
+
+    if offset > start:
+        sections.append(Section(name, start, offset, section_words))
+
+    return CVSegments(sections, word_count, has_email, has_phone, has_bullets)
+
+def attribute_keywords(segments, keyword_positions):
+    """Map each matched keyword to the sections it appears in"""
+    return {
+        keyword: sorted({segments.section_at(start) for start, _ in spans})
+        for keyword, spans in keyword_positions.items()
+    }
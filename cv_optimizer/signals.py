@@ -0,0 +1,8 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .keyword_index import invalidate_keyword_index
+from .models import ATSKeyword
+
+@receiver([post_save, post_delete], sender=ATSKeyword)
+def ats_keyword_changed(sender, **kwargs):
+    invalidate_keyword_index()
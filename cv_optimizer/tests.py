@@ -0,0 +1,423 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from xml.sax.saxutils import escape
+from django.core.cache import cache
+from asgiref.sync import sync_to_async
+from google.api_core import exceptions as api_exceptions
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import CustomUser
+from cv_optimizer.analysis_jobs import (
+    FAILED_ERROR, UNREADABLE_ERROR, claim_next_job, enqueue_analysis, requeue_stale_jobs, run_job
+)
+from cv_optimizer import metrics
+from cv_optimizer.ai_views import AsyncStreamOptimizedCVView
+from cv_optimizer.eviction import EvictionTrigger
+from cv_optimizer.gemini_cache import evict_responses
+from cv_optimizer.gemini_fake import FakeGeminiModel
+from cv_optimizer.gemini_resilience import CircuitBreaker, GeminiUnavailableError, call_gemini, reset_breaker
+from cv_optimizer.gemini_service import GeminiCVAnalyzer, reset_gemini_model
+from cv_optimizer.keyword_matcher import SCAN_MAX_KEYWORDS, KeywordMatcher, KeywordScanner, get_matcher
+from cv_optimizer.guide_store import IDLE_DAYS, evict_guides
+from cv_optimizer.models import AnalysisJob, ApplicationGuide, CVUpload, ExtractedText, GeminiResponse
+from cv_optimizer.segmenter import segment_cv
+from cv_optimizer.text_cache import get_upload_text
+from cv_optimizer.utils import is_extraction_error
+
+TEST_DIR = tempfile.mkdtemp(prefix='cv_optimizer_tests_')
+
+# Gemini answers from the local fake backend at once, uploads and locks go to a scratch directory,
+# and pages render without a collectstatic manifest
+TEST_SETTINGS = {
+    'GEMINI_BACKEND': 'fake',
+    'GEMINI_FAKE': {'latency': 'fixed', 'latency_median': 0, 'first_chunk_seconds': 0, 'chunk_seconds': 0},
+    'GEMINI_LOCK_DIR': os.path.join(TEST_DIR, 'locks'),
+    'MEDIA_ROOT': os.path.join(TEST_DIR, 'media'),
+    'CV_EXTRACTION_SANDBOX': False,
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}
+
+CV_LINES = [
+    'Jane Doe',
+    'jane@example.com',
+    'Summary',
+    'Backend developer building Django services.',
+    'Experience',
+    '• Built REST APIs in Python and SQL',
+    'Education',
+    'BSc Computer Science',
+]
+
+def docx_bytes(lines):
+    """Build a minimal .docx holding one paragraph per line"""
+    body = ''.join(f'<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>' for line in lines)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{body}</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', document)
+    return buffer.getvalue()
+
+@override_settings(**TEST_SETTINGS)
+class CVTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def setUp(self):
+        reset_gemini_model()
+        self.user = CustomUser.objects.create_user('jane', 'jane@example.com', 'password')
+        self.client.force_login(self.user)
+
+    def make_upload(self, lines=CV_LINES, **fields):
+        cv_upload = CVUpload(user=self.user, job_role=fields.pop('job_role', 'Software Developer'), **fields)
+        cv_upload.original_cv.save('cv.docx', ContentFile(docx_bytes(lines)))
+        return cv_upload
+
+class UploadTextTests(CVTestCase):
+    def test_reads_and_caches_upload_text(self):
+        cv_upload = self.make_upload()
+        text = get_upload_text(cv_upload)
+        self.assertIn('Built REST APIs', text)
+        self.assertTrue(ExtractedText.objects.filter(file_hash=cv_upload.file_hash).exists())
+
+    def test_deleted_upload_file_is_an_extraction_error(self):
+        cv_upload = self.make_upload()
+        os.remove(cv_upload.original_cv.path)
+
+        text = get_upload_text(cv_upload)
+        self.assertTrue(is_extraction_error(text))
+        self.assertFalse(ExtractedText.objects.exists())
+        self.assertEqual(CVUpload.objects.get(pk=cv_upload.pk).file_hash, '')
+
+    def test_analysis_page_renders_for_deleted_upload_file(self):
+        cv_upload = self.make_upload()
+        os.remove(cv_upload.original_cv.path)
+
+        response = self.client.get(reverse('cv_optimizer:analyze', args=[cv_upload.get_job_role_slug(), 1]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('error', response.context['analysis'])
+
+class KeywordMatcherTests(SimpleTestCase):
+    keywords = ['java', 'c++', 'c#', 'node.js', 'machine learning', 'learning', 'a a', 'sql']
+    text = 'Java and JavaScript; C++ / c# / cx; Node JS and node.js; machine  learning. a a a; xsql sql'
+
+    def test_matches_whole_tokens(self):
+        positions = KeywordMatcher(self.keywords).find_positions(self.text)
+        matched = {self.keywords[index]: len(spans) for index, spans in positions.items()}
+        self.assertEqual(matched, {
+            'java': 1, 'c++': 1, 'c#': 1, 'node.js': 2, 'machine learning': 1, 'learning': 1, 'a a': 2, 'sql': 1
+        })
+
+    def test_scanner_finds_the_same_spans_as_the_automaton(self):
+        self.assertEqual(
+            KeywordScanner(self.keywords).find_positions(self.text),
+            KeywordMatcher(self.keywords).find_positions(self.text)
+        )
+
+    def test_list_size_picks_the_matcher(self):
+        self.assertIsInstance(get_matcher(self.keywords), KeywordScanner)
+        many = [f'skill{number}' for number in range(SCAN_MAX_KEYWORDS + 1)]
+        self.assertIsInstance(get_matcher(many), KeywordMatcher)
+
+class SegmenterTests(SimpleTestCase):
+    def section_names(self, lines):
+        return [section.name for section in segment_cv('\n'.join(lines)).sections]
+
+    def test_headings_open_sections(self):
+        self.assertEqual(self.section_names(CV_LINES), ['contact', 'summary', 'experience', 'education'])
+
+    def test_numbered_and_colon_headings(self):
+        lines = ['Jane Doe', '1. Work Experience', 'Developer at Acme', 'Skills:', 'Python, SQL']
+        self.assertEqual(self.section_names(lines), ['contact', 'experience', 'skills'])
+
+    def test_bullets_mentioning_heading_terms_stay_in_their_section(self):
+        lines = ['Jane Doe', 'Experience', '• Taught education workshops', '- Led skills training', 'Teacher at Acme']
+        segments = segment_cv('\n'.join(lines))
+        self.assertEqual([section.name for section in segments.sections], ['contact', 'experience'])
+        self.assertFalse(segments.has_section('education'))
+        self.assertTrue(segments.has_bullets)
+
+    def test_sentences_mentioning_heading_terms_are_not_headings(self):
+        lines = ['Jane Doe', 'Seeking experience.', 'Love education!', 'Summary', 'Backend developer.']
+        segments = segment_cv('\n'.join(lines))
+        self.assertEqual([section.name for section in segments.sections], ['contact', 'summary'])
+        self.assertFalse(segments.has_section('experience'))
+
+    def test_section_at_offset(self):
+        text = '\n'.join(CV_LINES)
+        segments = segment_cv(text)
+        self.assertEqual(segments.section_at(text.index('Built REST APIs')), 'experience')
+        self.assertEqual(segments.section_at(0), 'contact')
+
+class AnalysisJobTests(CVTestCase):
+    def job_status(self, job):
+        return self.client.get(reverse('cv_optimizer:analysis_status', args=[job.pk])).json()
+
+    def test_claim_takes_each_queued_job_once(self):
+        first = enqueue_analysis(self.make_upload())
+        second = enqueue_analysis(self.make_upload())
+
+        claimed = claim_next_job('worker-a')
+        self.assertEqual((claimed.pk, claimed.status, claimed.worker, claimed.attempts), (first.pk, 'extracting', 'worker-a', 1))
+        self.assertEqual(claim_next_job('worker-b').pk, second.pk)
+        self.assertIsNone(claim_next_job('worker-c'))
+
+    def test_run_job_completes_the_analysis(self):
+        cv_upload = self.make_upload()
+        enqueue_analysis(cv_upload)
+
+        job = claim_next_job('worker-a')
+        self.assertTrue(run_job(job))
+        cv_upload.refresh_from_db()
+        self.assertTrue(cv_upload.optimized_content)
+        self.assertIn('job_total', cv_upload.stage_timings)
+
+        status = self.job_status(job)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['redirect_url'], reverse('cv_optimizer:ai_optimized', args=[cv_upload.pk]))
+
+    def test_unreadable_upload_fails_with_a_generic_message(self):
+        cv_upload = self.make_upload()
+        os.remove(cv_upload.original_cv.path)
+        enqueue_analysis(cv_upload)
+
+        job = claim_next_job('worker-a')
+        with self.assertLogs('cv_optimizer.analysis_jobs', 'WARNING'):
+            self.assertFalse(run_job(job))
+        status = self.job_status(job)
+        self.assertEqual((status['status'], status['error']), ('failed', UNREADABLE_ERROR))
+
+    def test_exception_text_stays_in_the_server_log(self):
+        enqueue_analysis(self.make_upload())
+
+        job = claim_next_job('worker-a')
+        failure = RuntimeError('database password rejected')
+        with mock.patch.object(GeminiCVAnalyzer, 'analyze_and_optimize', side_effect=failure):
+            with self.assertLogs('cv_optimizer.analysis_jobs', 'ERROR') as logs:
+                self.assertFalse(run_job(job))
+        self.assertIn('database password rejected', logs.output[0])
+        self.assertEqual(self.job_status(job)['error'], FAILED_ERROR)
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        retry = enqueue_analysis(self.make_upload())
+        spent = enqueue_analysis(self.make_upload())
+        stale = timezone.now() - timedelta(hours=1)
+        AnalysisJob.objects.filter(pk=retry.pk).update(status='scoring', attempts=1, updated_at=stale)
+        AnalysisJob.objects.filter(pk=spent.pk).update(status='optimizing', attempts=3, updated_at=stale)
+
+        self.assertEqual(requeue_stale_jobs(stale_after=60, max_attempts=3), (1, 1))
+        self.assertEqual(AnalysisJob.objects.get(pk=retry.pk).status, 'queued')
+        self.assertEqual(AnalysisJob.objects.get(pk=spent.pk).status, 'failed')
+
+class MetricsTests(CVTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user.is_staff = True
+        self.user.save()
+
+    def test_worker_stage_timings_reach_the_metrics_page(self):
+        enqueue_analysis(self.make_upload())
+        call_command('process_analysis_jobs', once=True, stdout=io.StringIO())
+        # The page is served by another process, which has timed nothing itself
+        metrics.reset()
+
+        with mock.patch.object(metrics, 'process_name', return_value='web:1'):
+            page = self.client.get(reverse('admin_metrics')).content.decode()
+        self.assertIn('cv_stage_seconds_count{stage="job_total"} 1', page)
+        self.assertIn('analysis_jobs_total{status="done"} 1', page)
+        self.assertIn(f'cv_text_cache_misses{{process="{metrics.process_name()}"}}', page)
+
+    def test_merge_sums_counters_and_histograms_and_labels_gauges(self):
+        metrics.increment('analysis_jobs_total', status='done')
+        metrics.observe('cv_stage_seconds', 0.2, stage='extract')
+        metrics.set_gauge('cv_extraction_workers', 2)
+        data = metrics.snapshot()
+
+        merged = metrics.merge_snapshots({'a:1': data, 'b:2': data})
+        self.assertEqual(merged['counters']['analysis_jobs_total'][(('status', 'done'),)], 2)
+        self.assertEqual(merged['histograms']['cv_stage_seconds'][(('stage', 'extract'),)][3], 2)
+        self.assertEqual(sorted(merged['gauges']['cv_extraction_workers']), [(('process', 'a:1'),), (('process', 'b:2'),)])
+
+class StreamOptimizedCVTests(CVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cv_upload = self.make_upload(gemini_analysis={'ats_score': 60}, optimized_content='Stored optimized CV')
+        self.url = reverse('cv_optimizer:stream_optimized', args=[self.cv_upload.pk])
+
+    def stream(self, url, client=None):
+        response = (client or self.client).get(url)
+        return b''.join(response.streaming_content).decode()
+
+    def count_gemini_calls(self):
+        return mock.patch.object(FakeGeminiModel, '_respond', autospec=True, side_effect=FakeGeminiModel._respond)
+
+    def stored_content(self):
+        return CVUpload.objects.get(pk=self.cv_upload.pk).optimized_content
+
+    def test_get_replays_a_stored_cv_without_calling_gemini(self):
+        with self.count_gemini_calls() as respond:
+            body = self.stream(self.url)
+            self.stream(self.url + '?refresh=1')
+        respond.assert_not_called()
+        self.assertIn('Stored optimized CV', body)
+        self.assertIn('event: done', body)
+        self.assertEqual(self.stored_content(), 'Stored optimized CV')
+
+    def test_get_generates_a_missing_cv(self):
+        CVUpload.objects.filter(pk=self.cv_upload.pk).update(optimized_content='')
+        with self.count_gemini_calls() as respond:
+            body = self.stream(self.url)
+        self.assertEqual(respond.call_count, 1)
+        self.assertIn('event: done', body)
+        self.assertTrue(self.stored_content())
+
+    def test_refresh_needs_a_csrf_checked_post(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        self.assertEqual(client.post(self.url).status_code, 403)
+
+    def test_refresh_token_regenerates_once(self):
+        refresh_url = self.client.post(self.url).json()['url']
+        with self.count_gemini_calls() as respond:
+            self.stream(refresh_url)
+            self.assertEqual(respond.call_count, 1)
+            self.assertNotEqual(self.stored_content(), 'Stored optimized CV')
+
+            CVUpload.objects.filter(pk=self.cv_upload.pk).update(optimized_content='Edited')
+            self.stream(refresh_url)
+            self.assertEqual(respond.call_count, 1)
+        self.assertEqual(self.stored_content(), 'Edited')
+
+    def test_refresh_token_is_only_issued_for_own_cvs(self):
+        other = CustomUser.objects.create_user('john', 'john@example.com', 'password')
+        client = Client()
+        client.force_login(other)
+        self.assertEqual(client.post(self.url).status_code, 404)
+
+    async def test_async_get_replays_a_stored_cv_without_calling_gemini(self):
+        request = RequestFactory().get(self.url)
+        request.user = self.user
+        request.session = SessionStore()
+        with self.count_gemini_calls() as respond:
+            response = await AsyncStreamOptimizedCVView.as_view()(request, cv_id=self.cv_upload.pk)
+            body = ''.join([chunk.decode() async for chunk in response])
+        respond.assert_not_called()
+        self.assertIn('Stored optimized CV', body)
+        self.assertEqual(await sync_to_async(self.stored_content)(), 'Stored optimized CV')
+
+class EvictionTests(TestCase):
+    def test_responses_evict_expired_then_least_recently_used(self):
+        now = timezone.now()
+        for number in range(5):
+            GeminiResponse.objects.create(
+                cache_key=f'key{number}', model_name='fake', method='analyze_cv', response_text='{}',
+                expires_at=now + timedelta(hours=-1 if number == 0 else 1), last_used_at=now - timedelta(minutes=number)
+            )
+
+        self.assertEqual(evict_responses(max_entries=2), (1, 2))
+        self.assertEqual(sorted(GeminiResponse.objects.values_list('cache_key', flat=True)), ['key1', 'key2'])
+
+    def test_guides_evict_idle_then_least_recently_viewed(self):
+        now = timezone.now()
+        views = {'idle': now - timedelta(days=IDLE_DAYS + 1), 'old': now - timedelta(days=2), 'new': now, 'unopened': None}
+        for name, last_viewed_at in views.items():
+            ApplicationGuide.objects.create(
+                title_key=name, company_key='', portal_key='', job_title=name, company='', portal='',
+                guide='Guide', generated_at=now - timedelta(days=1), last_viewed_at=last_viewed_at
+            )
+
+        self.assertEqual(evict_guides(max_entries=2), (1, 1))
+        self.assertEqual(sorted(ApplicationGuide.objects.values_list('title_key', flat=True)), ['new', 'unopened'])
+
+    def test_trigger_evicts_every_n_stores(self):
+        evict = mock.Mock()
+        trigger = EvictionTrigger(evict, every=3)
+        for _ in range(7):
+            trigger.stored()
+        self.assertEqual(evict.call_count, 2)
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('cv_optimizer.gemini_resilience.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.breaker = CircuitBreaker(error_rate=0.5, slow_seconds=20, open_seconds=30, min_calls=4)
+
+    def trip(self):
+        for ok in (True, False, False, True):
+            self.breaker.record(ok, 1)
+
+    def test_opens_once_enough_recent_calls_failed(self):
+        self.breaker.record(False, 1)
+        self.breaker.record(False, 1)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.record(True, 1)
+        self.breaker.record(True, 30)
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_one_trial_through_and_closes_on_success(self):
+        self.trip()
+        self.now += 30
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record(True, 1)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self.trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False, 1)
+        self.assertEqual(self.breaker.state, 'open')
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+
+    def test_trial_without_a_verdict_frees_the_slot(self):
+        self.trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(None, 1)
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertTrue(self.breaker.allow())
+
+@override_settings(GEMINI_RETRIES=0, GEMINI_BREAKER_ERROR_RATE=0.5, GEMINI_BREAKER_OPEN_SECONDS=30)
+class CallGeminiTests(SimpleTestCase):
+    def setUp(self):
+        reset_breaker()
+        self.addCleanup(reset_breaker)
+
+    def test_open_circuit_stops_calling_gemini(self):
+        call = mock.Mock(side_effect=api_exceptions.ServiceUnavailable('down'))
+        for _ in range(5):
+            with self.assertRaisesMessage(GeminiUnavailableError, 'failed'):
+                call_gemini('analyze_cv', call)
+
+        with self.assertRaisesMessage(GeminiUnavailableError, 'circuit_open'):
+            call_gemini('analyze_cv', call)
+        self.assertEqual(call.call_count, 5)
+
+    def test_bugs_on_our_side_surface_as_themselves(self):
+        with self.assertRaises(KeyError):
+            call_gemini('analyze_cv', mock.Mock(side_effect=KeyError('ats_score')))
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from django.db.models import F
+from .models import CVUpload, ExtractedText
+from .extraction_pool import extract_text_sandboxed
+from .metrics import span
+from .utils import EXTRACTOR_VERSION, is_extraction_error
+
+# Per-process hit/miss counters; persisted hit counts live on ExtractedText
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+def cache_stats():
+    """Return hit/miss counters for this process"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0
+    }
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_cv_text(file_path, file_hash=None):
+    """Return extracted text for a file, reusing the cached copy when possible"""
+    if file_hash is None:
+        try:
+            file_hash = hash_file(file_path)
+        except OSError as e:
+            return f"Error reading CV file: {str(e)}"
+
+    cached = ExtractedText.objects.filter(
+        file_hash=file_hash,
+        extractor_version=EXTRACTOR_VERSION
+    )
+    text = cached.values_list('text', flat=True).first()
+    if text is not None:
+        _record('hits')
+        cached.update(hit_count=F('hit_count') + 1)
+        return text
+
+    _record('misses')
+    with span('extract'):
+        text = extract_text_sandboxed(file_path)
+
+    store_cv_text(file_hash, text)
+    return text
+
+def store_cv_text(file_hash, text):
+    """Cache text extracted elsewhere, e.g. by a worker process"""
+    # Errors may be transient (missing file, bad upload), so never cache them
+    if not is_extraction_error(text):
+        ExtractedText.objects.get_or_create(
+            file_hash=file_hash,
+            extractor_version=EXTRACTOR_VERSION,
+            defaults={'text': text}
+        )
+
+def get_upload_text(cv_upload):
+    """Return the text of a CVUpload, recording its file hash on first use"""
+    file_path = cv_upload.original_cv.path
+    if not cv_upload.file_hash:
+        try:
+            file_hash = hash_file(file_path)
+        except OSError as e:
+            # Reported like an unreadable file, so views show the error and nothing is cached
+            return f"Error reading CV file: {str(e)}"
+        cv_upload.file_hash = file_hash
+        CVUpload.objects.filter(pk=cv_upload.pk).update(file_hash=file_hash)
+    return get_cv_text(file_path, cv_upload.file_hash)
@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views, latex_compiler_new, ai_views
 
+def ai_view(name):
+    # ASGI deployments serve the Gemini-backed pages from their async counterparts
+    prefix = 'Async' if settings.GEMINI_ASYNC_VIEWS else ''
+    return getattr(ai_views, prefix + name).as_view()
+
 app_name = 'cv_optimizer'
 
 urlpatterns = [
     path('upload/', views.CVUploadView.as_view(), name='upload'),
+    path('analysis-status/<int:job_id>/', views.AnalysisJobStatusView.as_view(), name='analysis_status'),
     path('analyze/<slug:job_role>/<int:cv_id>/', views.CVAnalysisView.as_view(), name='analyze'),
     path('optimize/<int:cv_id>/', views.CVOptimizeView.as_view(), name='optimize'),
     path('download/<int:cv_id>/', views.DownloadOptimizedCV.as_view(), name='download'),
@@ -15,10 +22,11 @@ urlpatterns = [
     # AI-Powered Features
     path('ai-optimized/<int:cv_id>/', ai_views.AIOptimizedCVView.as_view(), name='ai_optimized'),
     path('ai-download/<int:cv_id>/', ai_views.DownloadOptimizedAICVView.as_view(), name='ai_download'),
-    path('job-matching/<int:cv_id>/', ai_views.JobMatchingView.as_view(), name='job_matching'),
-    path('application-guide/', ai_views.JobApplicationGuideView.as_view(), name='application_guide'),
-    path('regenerate-analysis/<int:cv_id>/', ai_views.RegenerateAnalysisView.as_view(), name='regenerate_analysis'),
-    path('custom-job-search/', ai_views.CustomJobSearchView.as_view(), name='custom_job_search'),
+    path('ai-optimized/<int:cv_id>/stream/', ai_view('StreamOptimizedCVView'), name='stream_optimized'),
+    path('job-matching/<int:cv_id>/', ai_view('JobMatchingView'), name='job_matching'),
+    path('application-guide/', ai_view('JobApplicationGuideView'), name='application_guide'),
+    path('regenerate-analysis/<int:cv_id>/', ai_view('RegenerateAnalysisView'), name='regenerate_analysis'),
+    path('custom-job-search/', ai_view('CustomJobSearchView'), name='custom_job_search'),
     
     # CV Creation URLs
     path('create/', views.CVCreateView.as_view(), name='create'),
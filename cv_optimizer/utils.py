@@ -1,49 +1,56 @@
 import os
-import re
-import nltk
+import hashlib
 from collections import Counter
-from PyPDF2 import PdfReader
-from docx import Document
 import json
 import html
+from .keyword_matcher import get_matcher
+from .segmenter import segment_cv, attribute_keywords
+from .pdf_reader import read_pdf_text
+from .docx_reader import LegacyDocError, convert_legacy_doc, iter_docx_lines, sniff_format
+from .metrics import span
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# Bump whenever extraction output changes so cached texts are re-extracted
+EXTRACTOR_VERSION = 3
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+# Bump whenever scoring or suggestion logic changes so stored analyses are recomputed
+SCORER_VERSION = 4
 
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+def _setting(name, default):
+    # Extraction also runs in pool workers that may not have Django configured
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+    try:
+        return getattr(settings, name, default)
+    except ImproperlyConfigured:
+        return default
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file"""
+def extract_text_from_pdf(file_path, max_pages=None):
+    """Extract text from PDF file page by page"""
     try:
-        with open(file_path, 'rb') as file:
-            reader = PdfReader(file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-        return text
+        return read_pdf_text(
+            file_path,
+            max_pages=max_pages or _setting('CV_PDF_MAX_PAGES', 30),
+            engine=_setting('CV_PDF_ENGINE', 'auto'),
+            parallel_min_pages=_setting('CV_PDF_PARALLEL_MIN_PAGES', 8),
+            workers=_setting('CV_PDF_WORKERS', None)
+        )
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
 def extract_text_from_docx(file_path):
-    """Extract text from DOCX file"""
+    """Extract text from DOCX file, including tables, text boxes, headers and footers"""
     try:
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return '\n'.join(iter_docx_lines(file_path)) + '\n'
     except Exception as e:
         return f"Error reading DOCX: {str(e)}"
 
+def extract_text_from_doc(file_path):
+    """Extract text from a legacy Word .doc file"""
+    try:
+        return convert_legacy_doc(file_path)
+    except LegacyDocError as e:
+        return f"Error reading DOC: {str(e)}"
+
 def extract_text_from_file(file_path):
     """Extract text from various file formats"""
     file_extension = os.path.splitext(file_path)[1].lower()
@@ -51,93 +58,114 @@ def extract_text_from_file(file_path):
     if file_extension == '.pdf':
         return extract_text_from_pdf(file_path)
     elif file_extension in ['.docx', '.doc']:
+        # Word files are routed by content since .doc and .docx are often misnamed
+        try:
+            file_format = sniff_format(file_path)
+        except OSError as e:
+            return f"Error reading DOCX: {str(e)}"
+        if file_format == 'doc':
+            return extract_text_from_doc(file_path)
         return extract_text_from_docx(file_path)
     else:
         return "Unsupported file format"
 
+JOB_KEYWORDS = {
+    'software developer': [
+        'python', 'java', 'javascript', 'react', 'node.js', 'sql', 'git', 'agile',
+        'api', 'database', 'frontend', 'backend', 'full-stack', 'programming',
+        'software development', 'web development', 'mobile development'
+    ],
+    'data scientist': [
+        'python', 'r', 'machine learning', 'deep learning', 'statistics', 'sql',
+        'pandas', 'numpy', 'scikit-learn', 'tensorflow', 'pytorch', 'data analysis',
+        'data visualization', 'big data', 'hadoop', 'spark', 'tableau', 'power bi'
+    ],
+    'marketing manager': [
+        'digital marketing', 'seo', 'sem', 'social media', 'content marketing',
+        'email marketing', 'analytics', 'google analytics', 'campaign management',
+        'brand management', 'market research', 'lead generation', 'roi', 'kpi'
+    ],
+    'project manager': [
+        'project management', 'agile', 'scrum', 'pmp', 'risk management',
+        'stakeholder management', 'budget management', 'timeline management',
+        'team leadership', 'communication', 'planning', 'execution', 'monitoring'
+    ]
+}
+
+# Default keywords for any job
+DEFAULT_KEYWORDS = [
+    'experience', 'skills', 'education', 'certification', 'leadership',
+    'teamwork', 'communication', 'problem solving', 'analytical', 'creative'
+]
+
+def is_extraction_error(text):
+    """Check whether extracted text is actually an error message"""
+    return text.startswith("Error") or text == "Unsupported file format"
+
 def get_job_keywords(job_role):
     """Get relevant keywords for a job role"""
-    job_keywords = {
-        'software developer': [
-            'python', 'java', 'javascript', 'react', 'node.js', 'sql', 'git', 'agile',
-            'api', 'database', 'frontend', 'backend', 'full-stack', 'programming',
-            'software development', 'web development', 'mobile development'
-        ],
-        'data scientist': [
-            'python', 'r', 'machine learning', 'deep learning', 'statistics', 'sql',
-            'pandas', 'numpy', 'scikit-learn', 'tensorflow', 'pytorch', 'data analysis',
-            'data visualization', 'big data', 'hadoop', 'spark', 'tableau', 'power bi'
-        ],
-        'marketing manager': [
-            'digital marketing', 'seo', 'sem', 'social media', 'content marketing',
-            'email marketing', 'analytics', 'google analytics', 'campaign management',
-            'brand management', 'market research', 'lead generation', 'roi', 'kpi'
-        ],
-        'project manager': [
-            'project management', 'agile', 'scrum', 'pmp', 'risk management',
-            'stakeholder management', 'budget management', 'timeline management',
-            'team leadership', 'communication', 'planning', 'execution', 'monitoring'
-        ]
-    }
-    
-    # Default keywords for any job
-    default_keywords = [
-        'experience', 'skills', 'education', 'certification', 'leadership',
-        'teamwork', 'communication', 'problem solving', 'analytical', 'creative'
-    ]
-    
     job_role_lower = job_role.lower()
-    for role, keywords in job_keywords.items():
+    for role, keywords in JOB_KEYWORDS.items():
         if role in job_role_lower:
-            return keywords + default_keywords
+            return keywords + DEFAULT_KEYWORDS
     
-    return default_keywords
+    return list(DEFAULT_KEYWORDS)
 
-def calculate_ats_score(cv_text, job_keywords):
-    """Calculate ATS score based on keyword matching"""
-    cv_text_lower = cv_text.lower()
-    
-    # Remove stopwords
-    stop_words = set(stopwords.words('english'))
-    cv_words = [word for word in word_tokenize(cv_text_lower) if word.isalnum() and word not in stop_words]
-    
-    # Count keyword matches
-    keyword_matches = 0
-    matched_keywords = []
-    
-    for keyword in job_keywords:
-        if keyword.lower() in cv_text_lower:
-            keyword_matches += 1
-            matched_keywords.append(keyword)
+def get_keyword_version(job_keywords, weights=None):
+    """Get a short fingerprint identifying a keyword set and its weights"""
+    fingerprint = '\n'.join(job_keywords)
+    if weights is not None:
+        fingerprint += '\n' + ','.join(str(weight) for weight in weights)
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+def calculate_ats_score(cv_text, job_keywords, weights=None):
+    """Calculate ATS score based on keyword matching, optionally weighted per keyword"""
+    # Single pass over the CV with the cached keyword automaton
+    keyword_positions = get_matcher(job_keywords).find_positions(cv_text)
+    matched_keywords = [kw for index, kw in enumerate(job_keywords) if index in keyword_positions]
+    missing_keywords = [kw for index, kw in enumerate(job_keywords) if index not in keyword_positions]
     
     # Calculate score (0-100)
-    score = min((keyword_matches / len(job_keywords)) * 100, 100)
+    if weights is None:
+        score = min((len(matched_keywords) / len(job_keywords)) * 100, 100)
+    else:
+        total_weight = sum(weights)
+        matched_weight = sum(weights[index] for index in keyword_positions)
+        score = min((matched_weight / total_weight) * 100, 100) if total_weight else 0
     
     return {
         'score': round(score, 2),
         'matched_keywords': matched_keywords,
         'total_keywords': len(job_keywords),
-        'missing_keywords': [kw for kw in job_keywords if kw.lower() not in cv_text_lower]
+        'missing_keywords': missing_keywords,
+        'keyword_positions': {job_keywords[index]: spans for index, spans in keyword_positions.items()}
     }
 
-def analyze_cv_structure(cv_text):
+def analyze_cv_structure(cv_text, segments=None):
     """Analyze CV structure and format"""
+    if segments is None:
+        segments = segment_cv(cv_text)
+    
     analysis = {
-        'has_contact_info': bool(re.search(r'[\w\.-]+@[\w\.-]+\.\w+', cv_text)),
-        'has_phone': bool(re.search(r'[\+]?[1-9]?[0-9]{7,14}', cv_text)),
-        'has_experience_section': any(word in cv_text.lower() for word in ['experience', 'work history', 'employment']),
-        'has_education_section': any(word in cv_text.lower() for word in ['education', 'qualification', 'degree']),
-        'has_skills_section': any(word in cv_text.lower() for word in ['skills', 'technical skills', 'competencies']),
-        'word_count': len(cv_text.split()),
-        'has_bullet_points': '•' in cv_text or '*' in cv_text or '-' in cv_text
+        'has_contact_info': segments.has_email,
+        'has_phone': segments.has_phone,
+        'has_experience_section': segments.has_section('experience'),
+        'has_education_section': segments.has_section('education'),
+        'has_skills_section': segments.has_section('skills'),
+        'word_count': segments.word_count,
+        'has_bullet_points': segments.has_bullets,
+        'sections': segments.spans()
     }
     
     return analysis
 
-def analyze_cv(file_path, job_role):
+@span('analyze_cv')
+def analyze_cv(file_path, job_role, cv_text=None, job_keywords=None, weights=None):
     """Main function to analyze CV"""
-    # Extract text from CV
-    cv_text = extract_text_from_file(file_path)
+    # Extract text from CV, going through the extracted-text cache
+    if cv_text is None:
+        from .text_cache import get_cv_text
+        cv_text = get_cv_text(file_path)
     
     if cv_text.startswith("Error"):
         return {
@@ -146,22 +174,32 @@ def analyze_cv(file_path, job_role):
             'suggestions': ['Please upload a valid PDF or DOCX file.']
         }
     
-    # Get job-specific keywords
-    job_keywords = get_job_keywords(job_role)
+    # Get job-specific keywords, weighted from the ATSKeyword table
+    if job_keywords is None:
+        from .keyword_index import get_keyword_index
+        job_keywords, weights = get_keyword_index().keywords_for_role(job_role)
+    
+    # Segment once; structure and keyword attribution both read the spans
+    with span('segment'):
+        segments = segment_cv(cv_text)
     
     # Calculate ATS score
-    score_analysis = calculate_ats_score(cv_text, job_keywords)
+    with span('ats_score'):
+        score_analysis = calculate_ats_score(cv_text, job_keywords, weights)
     
     # Analyze CV structure
-    structure_analysis = analyze_cv_structure(cv_text)
+    with span('structure'):
+        structure_analysis = analyze_cv_structure(cv_text, segments)
     
     # Generate suggestions
-    suggestions = generate_suggestions(score_analysis, structure_analysis)
+    with span('suggestions'):
+        suggestions = generate_suggestions(score_analysis, structure_analysis)
     
     return {
         'score': score_analysis['score'],
         'matched_keywords': score_analysis['matched_keywords'],
         'missing_keywords': score_analysis['missing_keywords'],
+        'keyword_sections': attribute_keywords(segments, score_analysis['keyword_positions']),
         'structure_analysis': structure_analysis,
         'suggestions': suggestions,
         'job_role': job_role
@@ -3,11 +3,12 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import CreateView, DetailView, ListView, DeleteView, TemplateView, View
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
-from django.urls import reverse_lazy
-from .models import CVUpload, CreatedCV, CVTemplate
+from django.urls import reverse, reverse_lazy
+from .models import AnalysisJob, CVUpload, CreatedCV, CVTemplate
 from .forms import CVUploadForm, CVCreationForm
-from .utils import analyze_cv, optimize_cv, generate_cv_pdf, extract_text_from_file
-from .gemini_service import GeminiCVAnalyzer
+from .utils import optimize_cv, generate_cv_pdf
+from .analysis_store import get_analysis
+from .analysis_jobs import enqueue_analysis, job_status
 from .job_matcher import JobMatcher
 import json
 
@@ -19,33 +20,26 @@ class CVUploadView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.user = self.request.user
-        response = super().form_valid(form)
+        self.object = form.save()
         
-        # Perform Gemini AI analysis
-        try:
-            cv_text = extract_text_from_file(self.object.original_cv.path)
-            gemini_analyzer = GeminiCVAnalyzer()
-            analysis = gemini_analyzer.analyze_cv(cv_text, form.instance.job_role)
-            
-            # Save analysis results
-            self.object.gemini_analysis = analysis
-            self.object.ats_score = analysis.get('ats_score', 0)
-            self.object.missing_sections = analysis.get('missing_sections', [])
-            self.object.improvement_suggestions = analysis.get('improvements', [])
-            self.object.keyword_suggestions = analysis.get('keyword_suggestions', [])
-            self.object.job_match_percentage = analysis.get('job_match_percentage', 0)
-            
-            # Generate optimized CV content
-            optimized_content = gemini_analyzer.generate_optimized_cv(cv_text, analysis)
-            self.object.optimized_content = optimized_content
-            
-            self.object.save()
-            
-            messages.success(self.request, 'CV uploaded and analyzed successfully!')
-        except Exception as e:
-            messages.warning(self.request, f'CV uploaded but analysis failed: {str(e)}')
-        
-        return response
+        # Extraction and the Gemini calls run in 'manage.py process_analysis_jobs'
+        job = enqueue_analysis(self.object)
+        messages.success(self.request, 'CV uploaded! Analysis is running in the background.')
+        return redirect(f"{reverse('cv_optimizer:upload')}?job={job.pk}")
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        job_id = self.request.GET.get('job', '')
+        if job_id.isdigit():
+            context['analysis_job'] = AnalysisJob.objects.filter(
+                pk=job_id, cv_upload__user=self.request.user
+            ).first()
+        return context
+
+class AnalysisJobStatusView(LoginRequiredMixin, View):
+    def get(self, request, job_id):
+        job = get_object_or_404(AnalysisJob, pk=job_id, cv_upload__user=request.user)
+        return JsonResponse(job_status(job))
 
 class CVAnalysisView(LoginRequiredMixin, DetailView):
     model = CVUpload
@@ -78,12 +72,9 @@ class CVAnalysisView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cv_upload = self.get_object()
         
-        # Perform analysis
-        analysis = analyze_cv(cv_upload.original_cv.path, cv_upload.job_role)
-        cv_upload.ats_score = analysis['score']
-        cv_upload.save()
+        # Stored analysis is only recomputed when the file, keywords or scorer change
+        analysis = get_analysis(self.object)
         
         context['analysis'] = analysis
         return context
@@ -102,7 +93,7 @@ class CVOptimizeView(LoginRequiredMixin, DetailView):
         
         if not cv_upload.optimized_cv:
             # Generate optimization tips
-            analysis = analyze_cv(cv_upload.original_cv.path, cv_upload.job_role)
+            analysis = get_analysis(cv_upload)
             optimization_tips = optimize_cv(cv_upload.original_cv.path, analysis)
             messages.info(request, 'Optimization tips generated based on current analysis.')
         